@@ -111,21 +111,12 @@ class DocumentCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'color_preview', 'types_count', 'description')
     search_fields = ('name', 'description')
     
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(types_count=Count('types'))
-    
     def color_preview(self, obj):
         return format_html(
             '<div style="width: 20px; height: 20px; background-color: {}; border: 1px solid #ccc; display: inline-block;"></div>',
             obj.color
         )
     color_preview.short_description = 'Color'
-    
-    def types_count(self, obj):
-        return obj.types_count
-    types_count.short_description = 'Types'
-    types_count.admin_order_field = 'types_count'
 
 @admin.register(DocumentType)
 class DocumentTypeAdmin(admin.ModelAdmin):
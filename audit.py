@@ -0,0 +1,95 @@
+# audit.py - Buffer për DocumentAuditLog, i shkruar me bulk_create nga një thread në background
+import atexit
+import logging
+import queue
+import threading
+from functools import partial
+
+from django.db import close_old_connections, transaction
+
+from .models_improved import DocumentAuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0  # sekonda
+
+_queue = queue.SimpleQueue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def _next_batch(block: bool) -> list:
+    batch = []
+    try:
+        batch.append(_queue.get(timeout=AUDIT_FLUSH_INTERVAL) if block else _queue.get_nowait())
+        while len(batch) < AUDIT_BATCH_SIZE:
+            batch.append(_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+def _write_rows(rows: list) -> int:
+    # Një rresht i keq (p.sh. dokumenti u fshi ndërkohë) nuk duhet të hedhë poshtë të gjithë batch-in
+    written = 0
+    for row in rows:
+        try:
+            DocumentAuditLog.objects.create(**row)
+            written += 1
+        except Exception:
+            logger.exception(f"Failed to write document audit log for document {row.get('document_id')}")
+    return written
+
+def flush(block: bool = False) -> int:
+    """
+    Shkruan një batch nga buffer-i
+
+    Returns:
+        Numri i rreshtave të shkruar
+    """
+    batch = _next_batch(block)
+    if not batch:
+        return 0
+
+    try:
+        with transaction.atomic():
+            DocumentAuditLog.objects.bulk_create(
+                [DocumentAuditLog(**row) for row in batch], batch_size=AUDIT_BATCH_SIZE
+            )
+        return len(batch)
+    except Exception:
+        logger.warning(f"Bulk write of {len(batch)} document audit logs failed, retrying row by row")
+        return _write_rows(batch)
+
+def _run():
+    while True:
+        flush(block=True)
+        close_old_connections()
+
+def _ensure_worker():
+    # Thread-i niset me vonesë, që të niset edhe në çdo proces pas fork-ut
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='document-audit-writer', daemon=True)
+            _worker.start()
+
+def _put(row: dict):
+    _ensure_worker()
+    _queue.put(row)
+
+def enqueue(**fields):
+    """
+    Shton audit log-un në buffer pasi transaksioni aktual bën commit,
+    kështu që një rollback nuk lë audit log për veprime që nuk ndodhën.
+
+    Fushat jepen si vlera të thjeshta (document_id, user_id, action, ...),
+    jo model instances, që objektet e fshira ndërkohë të mos prishin batch-in.
+    """
+    transaction.on_commit(partial(_put, fields))
+
+@atexit.register
+def _flush_remaining():
+    while flush():
+        pass
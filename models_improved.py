@@ -1,9 +1,16 @@
 # models_improved.py - Struktura e përmirësuar e dokumenteve
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 # Custom user with role-based access
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -64,10 +71,37 @@ class DocumentCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     color = models.CharField(max_length=7, default="#007bff")  # Hex color për UI
+    # Numri i tipeve, i mbajtur nga signals e DocumentType (pa Count() në çdo listim)
+    types_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # types_count ndryshohet vetëm me F() nga signals; një instancë e vjetër
+        # nuk duhet ta mbishkruajë kur ruhet (p.sh. nga admin)
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [name for name in update_fields if name != 'types_count']
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def recount_types(cls, category_ids=None, using=DEFAULT_DB_ALIAS):
+        """Rillogarit types_count (p.sh. pas bulk_create, që nuk dërgon signals)"""
+        counts = DocumentType.objects.using(using).filter(category=OuterRef('pk')).order_by().values(
+            'category'
+        ).annotate(total=Count('pk')).values('total')
+        
+        categories = cls.objects.using(using).all()
+        if category_ids is not None:
+            categories = categories.filter(pk__in=category_ids)
+        categories.update(types_count=Coalesce(Subquery(counts), 0))
+
     class Meta:
         verbose_name_plural = "Document Categories"
 
@@ -156,12 +190,32 @@ class Document(models.Model):
     def __str__(self):
         return f"{self.title} (v{self.version})"
 
+    def resolve_access(self, user):
+        """
+        Gjen access control-in që vlen për user-in me një kalim të vetëm:
+        rreshti specifik i user-it ka përparësi ndaj atij të rolit.
+        Rreshtat e skaduar anashkalohen, si te utils.check_document_permission.
+        Përdor cache-in e prefetch_related('access_controls') kur ekziston.
+        """
+        now = timezone.now()
+        role_access = None
+        for access in self.access_controls.all():
+            if access.expires_at is not None and access.expires_at <= now:
+                continue
+            if access.user_id == user.id:
+                return access
+            if role_access is None and access.role == user.role:
+                role_access = access
+        return role_access
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['document_type', 'status']),
             models.Index(fields=['is_template']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['access_level', 'created_by']),
+            models.Index(fields=['is_template', 'access_level']),
         ]
 
 class DocumentCaseRelation(models.Model):
@@ -184,6 +238,10 @@ class DocumentCaseRelation(models.Model):
 
     class Meta:
         unique_together = ['document', 'case', 'relationship_type']
+        indexes = [
+            # unique_together fillon me document; filtrat sipas rastit fillojnë me case
+            models.Index(fields=['case', 'document']),
+        ]
 
 class DocumentAccess(models.Model):
     """
@@ -206,6 +264,9 @@ class DocumentAccess(models.Model):
 
     class Meta:
         unique_together = ['document', 'user']
+        indexes = [
+            models.Index(fields=['document', 'user', 'expires_at']),
+        ]
 
 # ==========================================
 # MODELET E TJERA (të pandryshuara)
@@ -265,3 +326,86 @@ class DocumentAuditLog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+# ==========================================
+# DocumentCategory.types_count
+# ==========================================
+
+def _shift_types_count(category_id, delta):
+    DocumentCategory.objects.filter(pk=category_id).update(types_count=F('types_count') + delta)
+
+@receiver(pre_save, sender=DocumentType)
+def _remember_type_category(sender, instance, **kwargs):
+    # Kategoria e mëparshme, që një ndryshim kategorie të zbresë numrin e vjetër
+    if not instance._state.adding:
+        instance._previous_category_id = DocumentType.objects.filter(
+            pk=instance.pk
+        ).values_list('category_id', flat=True).first()
+
+@receiver(post_save, sender=DocumentType)
+def _count_saved_type(sender, instance, created, **kwargs):
+    if created:
+        _shift_types_count(instance.category_id, 1)
+        return
+    
+    previous_category_id = getattr(instance, '_previous_category_id', None)
+    if previous_category_id is not None and previous_category_id != instance.category_id:
+        _shift_types_count(previous_category_id, -1)
+        _shift_types_count(instance.category_id, 1)
+
+@receiver(post_delete, sender=DocumentType)
+def _count_deleted_type(sender, instance, **kwargs):
+    _shift_types_count(instance.category_id, -1)
+
+@receiver(post_migrate)
+def backfill_types_count(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Plotëson types_count për kategoritë ekzistuese pas migrate, pasi kolona
+    e re fillon me 0 dhe signals numërojnë vetëm ndryshimet e mëvonshme.
+    """
+    if sender.label != DocumentCategory._meta.app_label:
+        return
+    
+    try:
+        DocumentCategory.recount_types(using=using)
+    except DatabaseError as e:
+        # P.sh. migrate deri te një migration para kolonës types_count
+        logger.warning(f"Could not backfill document category types_count: {e}")
+
+# ==========================================
+# TRIGRAM INDEXES PËR SEARCH (vetëm PostgreSQL)
+# ==========================================
+
+# Fushat që viewset-et kërkojnë me icontains
+TRIGRAM_SEARCH_FIELDS = {
+    Client: ('full_name', 'email', 'organization'),
+    Case: ('title', 'uid', 'description'),
+    Document: ('title', 'description', 'tags'),
+}
+
+@receiver(post_migrate)
+def create_trigram_search_indexes(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Krijon GIN indexes me pg_trgm mbi UPPER(kolona::text), shprehja që Django
+    gjeneron për icontains në PostgreSQL, kështu që search-i përdor index-in
+    pa ndryshuar semantikën. Në databaza të tjera nuk bën asgjë.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql' or sender.label != Document._meta.app_label:
+        return
+    
+    quote = connection.ops.quote_name
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for model, fields in TRIGRAM_SEARCH_FIELDS.items():
+                table = model._meta.db_table
+                for field_name in fields:
+                    column = model._meta.get_field(field_name).column
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {quote(f'{table}_{column}_trgm')} "
+                        f"ON {quote(table)} USING gin (UPPER({quote(column)}::text) gin_trgm_ops)"
+                    )
+    except DatabaseError as e:
+        # P.sh. përdoruesi i DB-së nuk ka të drejtë të krijojë extension
+        logger.warning(f"Could not create trigram search indexes: {e}")
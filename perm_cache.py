@@ -0,0 +1,96 @@
+# perm_cache.py - Cache i profilit të aksesit të përdoruesve në dokumente
+import math
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models_improved import DocumentAccess, User
+from .utils import _active_access_q
+
+# Sa sekonda ruhet profili në cache (i përbashkët për të gjithë worker-at)
+USER_ACCESS_CACHE_TIMEOUT = 30
+
+ACCESS_PERMISSION_FIELDS = ('can_view', 'can_download', 'can_edit', 'can_delete', 'can_share')
+
+def _cache_key(user_id: int) -> str:
+    return f"user_perms:{user_id}"
+
+def _compute_user_access_profile(user):
+    """
+    Ndërton profilin me një query: për çdo dokument mbahet rreshti aktiv i user-it,
+    ose (nëse mungon) rreshti i parë aktiv i rolit, si te Document.resolve_access.
+    Akseset e skaduara përjashtohen njësoj si te utils.check_document_permission.
+
+    Returns:
+        Tuple: (profile, timeout në sekonda deri sa të skadojë aksesi i parë)
+    """
+    now = timezone.now()
+    user_access = {}
+    role_access = {}
+    next_expiry = None
+    rows = DocumentAccess.objects.filter(
+        Q(user_id=user.id) | Q(role=user.role)
+    ).filter(_active_access_q()).order_by('pk').values(
+        'document_id', 'user_id', 'expires_at', *ACCESS_PERMISSION_FIELDS
+    )
+
+    for row in rows:
+        document_id = row.pop('document_id')
+        expires_at = row.pop('expires_at')
+        if expires_at is not None and (next_expiry is None or expires_at < next_expiry):
+            next_expiry = expires_at
+        if row.pop('user_id') == user.id:
+            user_access.setdefault(document_id, row)
+        else:
+            role_access.setdefault(document_id, row)
+
+    profile = {
+        'role': user.role,
+        'document_access': {**role_access, **user_access},
+    }
+
+    # Profili nuk duhet të mbajë në cache një akses pasi ai ka skaduar
+    timeout = USER_ACCESS_CACHE_TIMEOUT
+    if next_expiry is not None:
+        timeout = max(1, min(timeout, math.ceil((next_expiry - now).total_seconds())))
+    return profile, timeout
+
+def get_user_access_profile(user):
+    """
+    Kthen profilin e aksesit të user-it nga cache:
+    {'role': ..., 'document_access': {document_id: {'can_view': ..., ...}}}
+    """
+    key = _cache_key(user.id)
+    profile = cache.get(key)
+    if profile is None:
+        profile, timeout = _compute_user_access_profile(user)
+        cache.set(key, profile, timeout)
+    return profile
+
+def _delete_after_commit(keys):
+    # Fshirja pas commit-it: një request paralel nuk mund ta rindërtojë profilin
+    # nga gjendja e vjetër para se shkrimi të jetë i dukshëm
+    transaction.on_commit(partial(cache.delete_many, keys))
+
+def invalidate_user_access_profile(user_id: int):
+    _delete_after_commit([_cache_key(user_id)])
+
+@receiver([post_save, post_delete], sender=DocumentAccess)
+def _invalidate_on_access_change(sender, instance, **kwargs):
+    if instance.user_id:
+        invalidate_user_access_profile(instance.user_id)
+
+    if instance.role:
+        # Rreshtat e rolit prekin të gjithë përdoruesit me atë rol
+        user_ids = User.objects.filter(role=instance.role).values_list('id', flat=True)
+        _delete_after_commit([_cache_key(user_id) for user_id in user_ids])
+
+@receiver(post_save, sender=User)
+def _invalidate_on_user_change(sender, instance, **kwargs):
+    # Roli i user-it mund të ketë ndryshuar
+    invalidate_user_access_profile(instance.pk)
@@ -22,14 +22,10 @@ class ClientSerializer(serializers.ModelSerializer):
         return obj.cases.count()
 
 class DocumentCategorySerializer(serializers.ModelSerializer):
-    types_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = DocumentCategory
         fields = '__all__'
-    
-    def get_types_count(self, obj):
-        return obj.types.count()
+        read_only_fields = ['types_count']
 
 class DocumentTypeSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -131,16 +127,11 @@ class DocumentSerializer(serializers.ModelSerializer):
         if obj.created_by == user:
             return True
         
-        # Kontrollo access controls specifike
-        access = obj.access_controls.filter(user=user).first()
+        # Kontrollo access controls specifike, pastaj ato bazuar në role
+        access = obj.resolve_access(user)
         if access:
             return access.can_edit
         
-        # Kontrollo access controls bazuar në role
-        role_access = obj.access_controls.filter(role=user.role).first()
-        if role_access:
-            return role_access.can_edit
-        
         return False
     
     def get_can_delete(self, obj):
@@ -169,16 +160,11 @@ class DocumentSerializer(serializers.ModelSerializer):
         if obj.access_level == 'internal' and user.role in ['lawyer', 'paralegal']:
             return True
         
-        # Kontrollo access controls specifike
-        access = obj.access_controls.filter(user=user).first()
+        # Kontrollo access controls specifike, pastaj ato bazuar në role
+        access = obj.resolve_access(user)
         if access:
             return access.can_download
         
-        # Kontrollo access controls bazuar në role
-        role_access = obj.access_controls.filter(role=user.role).first()
-        if role_access:
-            return role_access.can_download
-        
         return False
 
 class CaseSerializer(serializers.ModelSerializer):
@@ -202,9 +188,17 @@ class CaseSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'uid', 'created_at', 'updated_at']
     
+    def _get_relations(self, obj):
+        # Përdor prefetch-in e CaseViewSet kur ekziston
+        if 'documentcaserelation_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            return obj.documentcaserelation_set.all()
+        return DocumentCaseRelation.objects.filter(case=obj).select_related(
+            'document__document_type', 'document__status'
+        )
+    
     def get_documents(self, obj):
         # Merr dokumentet e lidhura me këtë rast
-        relations = DocumentCaseRelation.objects.filter(case=obj).select_related('document')
+        relations = self._get_relations(obj)
         documents_data = []
         
         for relation in relations:
@@ -222,9 +216,15 @@ class CaseSerializer(serializers.ModelSerializer):
         return documents_data
     
     def get_documents_count(self, obj):
+        if 'documentcaserelation_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.documentcaserelation_set.all())
+        if hasattr(obj, 'documents_count'):
+            return obj.documents_count
         return DocumentCaseRelation.objects.filter(case=obj).count()
     
     def get_events_count(self, obj):
+        if hasattr(obj, 'events_count'):
+            return obj.events_count
         return obj.events.count()
 
 # Serializer për bulk operations
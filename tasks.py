@@ -250,6 +250,26 @@ def process_document_ocr(document_id: int):
         logger.error(f"Error processing OCR for document {document_id}: {str(exc)}")
         return False
 
+@shared_task
+def log_document_view(document_id: int, user_id: int, ip_address: str = None, user_agent: str = ''):
+    """
+    Përditëson last_accessed dhe regjistron shikimin e dokumentit jashtë request-it
+    """
+    # Update last_accessed me një UPDATE, pa SELECT dhe pa Document.save()
+    if not Document.objects.filter(id=document_id).update(last_accessed=timezone.now()):
+        logger.warning(f"Document {document_id} not found for view logging")
+        return False
+    
+    # Log view
+    DocumentAuditLog.objects.create(
+        document_id=document_id,
+        user_id=user_id,
+        action='viewed',
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+    return True
+
 # ==========================================
 # MAINTENANCE & CLEANUP TASKS
 # ==========================================
@@ -5,33 +5,140 @@ Legal Case Manager - Layout Test Script
 Teston strukturën e re të layout-it dhe identifikon probleme të mundshme.
 """
 
+import io
 import os
+import re
 import sys
 import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+# Patterns të kompiluara një herë, për skanim me një kalim të vetëm
+_CSS_CLASS_RE = re.compile(r'\.([\w-]+)')
+_MEDIA_QUERY_RE = re.compile(r'@media \((?:max|min)-width: [\d.]+px\)')
+_TEMPLATE_TAG_RE = re.compile(r'{%\s*(block|endblock|if|endif)\b')
+_CONFLICT_RE = re.compile(r'(?P<sidebar>\.sidebar \{)|(?P<fixed>position: fixed)')
+_DOCTYPE_RE = re.compile(r'\s*<!DOCTYPE html>')
+
+MOBILE_CSS = 'static/css/mobile-dashboard.css'
+
+REQUIRED_FILES = frozenset({
+    'templates/base.html',
+    'templates/partials/sidebar.html',
+    'static/css/custom.css',
+    MOBILE_CSS,
+})
+
+REQUIRED_CSS_CLASSES = frozenset({
+    'app-container',
+    'sidebar',
+    'main-content',
+    'sidebar-overlay'
+})
+
+RESPONSIVE_BREAKPOINTS = (
+    '@media (max-width: 991.98px)',  # Mobile
+    '@media (min-width: 992px)',     # Desktop
+    '@media (max-width: 767.98px)',  # Small mobile
+)
+
+_QUICK_TEST_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Quick Layout Test</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link rel="stylesheet" href="static/css/custom.css">
+    <style>
+        .test-box { 
+            background: #e3f2fd; 
+            border: 2px solid #1976d2; 
+            padding: 1rem; 
+            margin: 1rem 0; 
+            border-radius: 8px;
+        }
+    </style>
+</head>
+<body>
+    <nav class="navbar navbar-dark bg-dark fixed-top">
+        <div class="container-fluid">
+            <button class="btn btn-outline-light d-lg-none" id="toggleBtn">Menu</button>
+            <span class="navbar-brand">Layout Test</span>
+        </div>
+    </nav>
+    
+    <div class="app-container">
+        <div class="sidebar-overlay" id="overlay"></div>
+        
+        <div class="sidebar" id="sidebar">
+            <div class="sidebar-header">
+                <h6>Test Sidebar</h6>
+                <button class="btn btn-sm btn-outline-light d-lg-none" id="closeBtn">X</button>
+            </div>
+            <div class="sidebar-content">
+                <div class="nav-link">Dashboard</div>
+                <div class="nav-link">Cases</div>
+                <div class="nav-link">Clients</div>
+            </div>
+        </div>
+        
+        <main class="main-content with-sidebar">
+            <div class="content-wrapper">
+                <div class="test-box">
+                    <h2>Layout Test</h2>
+                    <p>If you can see this properly, the layout is working!</p>
+                    <button class="btn btn-primary" onclick="alert('Button works!')">Test Button</button>
+                </div>
+                
+                <div class="test-box">
+                    <h4>Instructions:</h4>
+                    <ol>
+                        <li>Resize window to test responsive behavior</li>
+                        <li>On small screens, click Menu to open sidebar</li>
+                        <li>Click X or outside to close sidebar</li>
+                    </ol>
+                </div>
+            </div>
+        </main>
+    </div>
+    
+    <script>
+        const toggle = document.getElementById('toggleBtn');
+        const sidebar = document.getElementById('sidebar');
+        const overlay = document.getElementById('overlay');
+        const close = document.getElementById('closeBtn');
+        
+        toggle.onclick = () => {
+            sidebar.classList.add('show');
+            overlay.classList.add('show');
+        };
+        
+        close.onclick = overlay.onclick = () => {
+            sidebar.classList.remove('show');
+            overlay.classList.remove('show');
+        };
+        
+        console.log('Test script loaded successfully');
+    </script>
+</body>
+</html>
+"""
+
 def test_file_structure():
-    """Test file structure dhe templates"""
+    """Test file structure dhe templates, kthen file-t që ekzistojnë"""
     print("=> Testing file structure...")
     
-    required_files = [
-        'templates/base.html',
-        'templates/partials/sidebar.html',
-        'static/css/custom.css',
-        'static/css/mobile-dashboard.css',
-    ]
-    
-    missing_files = []
-    for file_path in required_files:
-        if not os.path.exists(file_path):
-            missing_files.append(file_path)
+    present_files = {path for path in REQUIRED_FILES if os.path.exists(path)}
+    missing_files = sorted(REQUIRED_FILES - present_files)
     
     if missing_files:
         print(f"[ERROR] Missing files: {missing_files}")
-        return False
     else:
         print("[OK] All required files found")
-        return True
+    return present_files
 
 def test_template_syntax():
     """Test Django template syntax"""
@@ -46,14 +153,16 @@ def test_template_syntax():
         errors = []
         
         # Check for unclosed tags
-        if content.count('{% block') != content.count('{% endblock %}'):
+        tag_counts = Counter(m.group(1) for m in _TEMPLATE_TAG_RE.finditer(content))
+        
+        if tag_counts['block'] != tag_counts['endblock']:
             errors.append("Mismatched block tags")
             
-        if content.count('{% if') > content.count('{% endif %}'):
+        if tag_counts['if'] > tag_counts['endif']:
             errors.append("Unclosed if statements")
             
         # Check for proper DOCTYPE
-        if not content.strip().startswith('<!DOCTYPE html>'):
+        if not _DOCTYPE_RE.match(content):
             errors.append("Missing or incorrect DOCTYPE")
             
         if errors:
@@ -76,25 +185,17 @@ def test_css_structure():
             css_content = f.read()
             
         # Basic CSS syntax checks
-        open_braces = css_content.count('{')
-        close_braces = css_content.count('}')
+        char_counts = Counter(css_content)
+        open_braces = char_counts['{']
+        close_braces = char_counts['}']
         
         if open_braces != close_braces:
             print(f"[ERROR] CSS syntax error: {open_braces} opening braces, {close_braces} closing braces")
             return False
             
         # Check for key layout classes
-        required_classes = [
-            '.app-container',
-            '.sidebar',
-            '.main-content',
-            '.sidebar-overlay'
-        ]
-        
-        missing_classes = []
-        for class_name in required_classes:
-            if class_name not in css_content:
-                missing_classes.append(class_name)
+        found_classes = REQUIRED_CSS_CLASSES.intersection(_CSS_CLASS_RE.findall(css_content))
+        missing_classes = sorted(f'.{name}' for name in REQUIRED_CSS_CLASSES - found_classes)
                 
         if missing_classes:
             print(f"[ERROR] Missing CSS classes: {missing_classes}")
@@ -116,16 +217,8 @@ def test_responsive_breakpoints():
             css_content = f.read()
             
         # Check for responsive breakpoints
-        breakpoints = [
-            '@media (max-width: 991.98px)',  # Mobile
-            '@media (min-width: 992px)',     # Desktop
-            '@media (max-width: 767.98px)',  # Small mobile
-        ]
-        
-        missing_breakpoints = []
-        for breakpoint in breakpoints:
-            if breakpoint not in css_content:
-                missing_breakpoints.append(breakpoint)
+        found_breakpoints = set(_MEDIA_QUERY_RE.findall(css_content))
+        missing_breakpoints = [bp for bp in RESPONSIVE_BREAKPOINTS if bp not in found_breakpoints]
                 
         if missing_breakpoints:
             print(f"[WARNING] Missing responsive breakpoints: {missing_breakpoints}")
@@ -138,28 +231,38 @@ def test_responsive_breakpoints():
         print(f"[ERROR] Error checking breakpoints: {e}")
         return False
 
-def check_conflicts():
+def scan_css_conflicts(css_content):
+    """Numëron përkufizimet .sidebar dhe position: fixed me një kalim"""
+    return Counter(m.lastgroup for m in _CONFLICT_RE.finditer(css_content))
+
+def check_conflicts(present_files=None):
     """Check for potential CSS conflicts"""
     print("\n=> Checking for potential conflicts...")
     
     try:
-        # Read both CSS files
+        # Read both CSS files (mobile CSS vetëm nëse test_file_structure e gjeti)
         with open('static/css/custom.css', 'r', encoding='utf-8') as f:
             custom_css = f.read()
-        with open('static/css/mobile-dashboard.css', 'r', encoding='utf-8') as f:
-            mobile_css = f.read()
+        if present_files is not None and MOBILE_CSS not in present_files:
+            mobile_css = ''
+        else:
+            with open(MOBILE_CSS, 'r', encoding='utf-8') as f:
+                mobile_css = f.read()
             
+        custom_counts = scan_css_conflicts(custom_css)
+        mobile_counts = scan_css_conflicts(mobile_css)
+        
         conflicts = []
         
         # Check for duplicate sidebar definitions
-        if custom_css.count('.sidebar {') > 1:
+        if custom_counts['sidebar'] > 1:
             conflicts.append("Multiple .sidebar definitions in custom.css")
             
-        if '.sidebar {' in custom_css and '.sidebar {' in mobile_css:
+        if custom_counts['sidebar'] and mobile_counts['sidebar']:
             conflicts.append("Sidebar defined in both CSS files")
             
         # Check for conflicting positioning
-        if 'position: fixed' in custom_css and 'position: fixed' in mobile_css:
+        if custom_counts['fixed'] and mobile_counts['fixed']:
             print("[INFO] Both CSS files use fixed positioning - check for conflicts")
             
         if conflicts:
@@ -177,132 +280,95 @@ def generate_quick_test():
     """Generate a simple test to verify layout works"""
     print("\n=> Generating quick layout test...")
     
-    test_content = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Quick Layout Test</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link rel="stylesheet" href="static/css/custom.css">
-    <style>
-        .test-box { 
-            background: #e3f2fd; 
-            border: 2px solid #1976d2; 
-            padding: 1rem; 
-            margin: 1rem 0; 
-            border-radius: 8px;
-        }
-    </style>
-</head>
-<body>
-    <nav class="navbar navbar-dark bg-dark fixed-top">
-        <div class="container-fluid">
-            <button class="btn btn-outline-light d-lg-none" id="toggleBtn">Menu</button>
-            <span class="navbar-brand">Layout Test</span>
-        </div>
-    </nav>
-    
-    <div class="app-container">
-        <div class="sidebar-overlay" id="overlay"></div>
-        
-        <div class="sidebar" id="sidebar">
-            <div class="sidebar-header">
-                <h6>Test Sidebar</h6>
-                <button class="btn btn-sm btn-outline-light d-lg-none" id="closeBtn">X</button>
-            </div>
-            <div class="sidebar-content">
-                <div class="nav-link">Dashboard</div>
-                <div class="nav-link">Cases</div>
-                <div class="nav-link">Clients</div>
-            </div>
-        </div>
-        
-        <main class="main-content with-sidebar">
-            <div class="content-wrapper">
-                <div class="test-box">
-                    <h2>Layout Test</h2>
-                    <p>If you can see this properly, the layout is working!</p>
-                    <button class="btn btn-primary" onclick="alert('Button works!')">Test Button</button>
-                </div>
-                
-                <div class="test-box">
-                    <h4>Instructions:</h4>
-                    <ol>
-                        <li>Resize window to test responsive behavior</li>
-                        <li>On small screens, click Menu to open sidebar</li>
-                        <li>Click X or outside to close sidebar</li>
-                    </ol>
-                </div>
-            </div>
-        </main>
-    </div>
+    expected = _QUICK_TEST_HTML.strip().encode('utf-8')
     
-    <script>
-        const toggle = document.getElementById('toggleBtn');
-        const sidebar = document.getElementById('sidebar');
-        const overlay = document.getElementById('overlay');
-        const close = document.getElementById('closeBtn');
-        
-        toggle.onclick = () => {
-            sidebar.classList.add('show');
-            overlay.classList.add('show');
-        };
-        
-        close.onclick = overlay.onclick = () => {
-            sidebar.classList.remove('show');
-            overlay.classList.remove('show');
-        };
-        
-        console.log('Test script loaded successfully');
-    </script>
-</body>
-</html>
-    """
+    try:
+        if Path('quick_test.html').read_bytes() == expected:
+            print("[OK] Quick test file is up to date: quick_test.html")
+            return True
+    except FileNotFoundError:
+        pass
     
     try:
-        with open('quick_test.html', 'w', encoding='utf-8') as f:
-            f.write(test_content.strip())
+        Path('quick_test.html').write_bytes(expected)
         print("[OK] Quick test file created: quick_test.html")
         return True
     except Exception as e:
         print(f"[ERROR] Could not create test file: {e}")
         return False
 
-def run_all_tests():
-    """Run all tests"""
-    print("Legal Case Manager - Layout Testing")
-    print("=" * 50)
+class _ThreadBufferedStdout:
+    """Stdout që ruan output-in e çdo thread-i veç, që log-et të mos përzihen"""
     
-    all_passed = True
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
     
-    # Test file structure
-    if not test_file_structure():
-        all_passed = False
+    def start_capture(self):
+        self._local.buffer = io.StringIO()
     
-    # Test template syntax
-    if not test_template_syntax():
-        all_passed = False
+    def stop_capture(self):
+        buffer, self._local.buffer = self._local.buffer, None
+        return buffer.getvalue()
     
-    # Test CSS structure
-    if not test_css_structure():
-        all_passed = False
+    def write(self, text):
+        return (getattr(self._local, 'buffer', None) or self._stream).write(text)
     
-    # Test responsive breakpoints
-    if not test_responsive_breakpoints():
-        all_passed = False
+    def flush(self):
+        self._stream.flush()
+
+def _run_checks_concurrently(checks, max_workers=4):
+    """Ekzekuton kontrollet e pavarura paralelisht dhe printon output-in sipas radhës"""
+    stdout = _ThreadBufferedStdout(sys.stdout)
     
-    # Check for conflicts
-    if not check_conflicts():
-        all_passed = False
+    def run_check(check):
+        stdout.start_capture()
+        try:
+            return check(), stdout.stop_capture()
+        except BaseException:
+            stdout.stop_capture()
+            raise
+    
+    original_stdout, sys.stdout = sys.stdout, stdout
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(run_check, checks))
+    finally:
+        sys.stdout = original_stdout
+    
+    results = []
+    for result, output in outcomes:
+        sys.stdout.write(output)
+        results.append(result)
+    return results
+
+def run_all_tests(generate_fixture=False):
+    """Run all tests"""
+    print("Legal Case Manager - Layout Testing")
+    print("=" * 50)
+    
+    # Test file structure
+    present_files = test_file_structure()
+    
+    # Kontrollet e tjera vetëm lexojnë file, prandaj ekzekutohen paralelisht
+    results = _run_checks_concurrently([
+        test_template_syntax,
+        test_css_structure,
+        test_responsive_breakpoints,
+        partial(check_conflicts, present_files),
+    ])
+    all_passed = present_files == REQUIRED_FILES and all(results)
     
-    # Generate test file
-    if not generate_quick_test():
+    # Generate test file (vetëm kur kërkohet me --generate-fixture)
+    if generate_fixture and not generate_quick_test():
         all_passed = False
     
     print("\n" + "=" * 50)
     if all_passed:
         print("[SUCCESS] All tests passed! Layout should be working correctly.")
         print("\nNext steps:")
+        if not generate_fixture:
+            print("   0. Run with --generate-fixture to create quick_test.html")
         print("   1. Open quick_test.html in your browser")
         print("   2. Test responsive behavior by resizing window")
         print("   3. On mobile size, test sidebar toggle functionality")
@@ -315,4 +381,13 @@ def run_all_tests():
     return all_passed
 
 if __name__ == "__main__":
-    run_all_tests()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Legal Case Manager layout tests")
+    parser.add_argument(
+        '--generate-fixture',
+        action='store_true',
+        help="Generate quick_test.html for manual layout testing"
+    )
+    args = parser.parse_args()
+    run_all_tests(generate_fixture=args.generate_fixture)
@@ -2,8 +2,19 @@
 """
 Test script for PWA notification fixes
 """
-import requests
-import time
+import re
+from pathlib import Path
+
+STATIC_JS_DIR = Path(__file__).resolve().parent / 'static' / 'js'
+
+# Markers of the fixes in pwa.js, found with a single scan of the file
+FIX_MARKERS = (
+    'addEventListener',
+    'enableNotifications',
+    'hasUserDismissedNotificationPrompt',
+    'trackNotificationEvent',
+)
+_FIX_MARKERS_RE = re.compile('|'.join(map(re.escape, FIX_MARKERS)))
 
 def test_notification_popup_fix():
     """Test if the notification popup fix works"""
@@ -11,23 +22,25 @@ def test_notification_popup_fix():
     
     # Test 1: Check if PWA file exists and is readable
     try:
-        with open('C:/GPT4_PROJECTS/JURISTI/static/js/pwa.js', 'r') as f:
+        with open(STATIC_JS_DIR / 'pwa.js', 'r', encoding='utf-8') as f:
             content = f.read()
             
         print("SUCCESS: PWA file found and readable")
         
+        found = set(_FIX_MARKERS_RE.findall(content))
+        
         # Check for key fixes
-        if 'addEventListener' in content and 'enableNotifications' in content:
+        if 'addEventListener' in found and 'enableNotifications' in found:
             print("SUCCESS: Event listener fixes present")
         else:
             print("WARNING: Event listener fixes might be missing")
             
-        if 'hasUserDismissedNotificationPrompt' in content:
+        if 'hasUserDismissedNotificationPrompt' in found:
             print("SUCCESS: Anti-spam functionality present")
         else:
             print("WARNING: Anti-spam functionality missing")
             
-        if 'trackNotificationEvent' in content:
+        if 'trackNotificationEvent' in found:
             print("SUCCESS: Analytics tracking present")
         else:
             print("WARNING: Analytics tracking missing")
@@ -38,7 +51,7 @@ def test_notification_popup_fix():
     
     # Test 2: Check if service worker exists (optional)
     try:
-        with open('C:/GPT4_PROJECTS/JURISTI/static/js/sw.js', 'r') as f:
+        with open(STATIC_JS_DIR / 'sw.js', 'r', encoding='utf-8') as f:
             sw_content = f.read()
         print("INFO: Service worker file found")
     except FileNotFoundError:
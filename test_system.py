@@ -7,8 +7,7 @@ from django.core.files.base import ContentFile
 from django.test import TestCase, Client
 from django.contrib.auth import authenticate
 from django.urls import reverse
-from rest_framework.test import APIClient
-from rest_framework import status
+from django.db import transaction
 import json
 
 # Setup Django environment (nëse run standalone)
@@ -21,43 +20,49 @@ from models_improved import (
     DocumentType, DocumentStatus, DocumentCaseRelation, DocumentAccess
 )
 
+# Përmbajtja e file-ve të testit (bytes janë immutable, ndahen pa kopjim)
+_TEMPLATE_BYTES = b'This is a contract template with placeholders for {{client_name}}, {{contract_date}}, and {{amount}}.'
+_CONTRACT_BYTES = b'This is a client agreement contract for the specific case.'
+
 class SystemTestCase(TestCase):
     """Test i plotë i sistemit të menaxhimit të dokumenteve"""
     
-    def setUp(self):
-        """Setup të dhënat e testimit"""
+    @classmethod
+    def setUpTestData(cls):
+        """Setup të dhënat e testimit (një herë për klasë)"""
         print("🔧 Setting up test data...")
         
-        # Krijo users
-        self.admin_user = User.objects.create_user(
-            username='admin',
-            email='admin@test.com',
-            password='testpass123',
-            role='admin',
-            first_name='Admin',
-            last_name='User'
-        )
-        
-        self.lawyer_user = User.objects.create_user(
-            username='lawyer1',
-            email='lawyer@test.com',
-            password='testpass123',
-            role='lawyer',
-            first_name='John',
-            last_name='Lawyer'
-        )
-        
-        self.client_user = User.objects.create_user(
-            username='client1',
-            email='client@test.com',
-            password='testpass123',
-            role='client',
-            first_name='Jane',
-            last_name='Client'
-        )
+        # Krijo users (create_user duhet për hash-in e password-it)
+        with transaction.atomic():
+            cls.admin_user = User.objects.create_user(
+                username='admin',
+                email='admin@test.com',
+                password='testpass123',
+                role='admin',
+                first_name='Admin',
+                last_name='User'
+            )
+            
+            cls.lawyer_user = User.objects.create_user(
+                username='lawyer1',
+                email='lawyer@test.com',
+                password='testpass123',
+                role='lawyer',
+                first_name='John',
+                last_name='Lawyer'
+            )
+            
+            cls.client_user = User.objects.create_user(
+                username='client1',
+                email='client@test.com',
+                password='testpass123',
+                role='client',
+                first_name='Jane',
+                last_name='Client'
+            )
         
         # Krijo client
-        self.client_obj = ClientModel.objects.create(
+        cls.client_obj = ClientModel.objects.create(
             full_name='Test Client Company',
             email='client@company.com',
             phone='+355691234567',
@@ -65,57 +70,77 @@ class SystemTestCase(TestCase):
         )
         
         # Krijo case
-        self.case = Case.objects.create(
+        cls.case = Case.objects.create(
             title='Test Litigation Case',
             description='A test case for litigation purposes',
-            client=self.client_obj,
-            assigned_to=self.lawyer_user,
+            client=cls.client_obj,
+            assigned_to=cls.lawyer_user,
             case_type='civil',
             status='open'
         )
         
-        # Krijo document categories dhe types
-        self.legal_category = DocumentCategory.objects.create(
-            name='Legal Documents',
-            description='Official legal documents',
-            color='#007bff'
-        )
-        
-        self.template_category = DocumentCategory.objects.create(
-            name='Templates',
-            description='Document templates',
-            color='#28a745'
-        )
-        
-        self.contract_type = DocumentType.objects.create(
-            name='Contract',
-            category=self.legal_category,
-            is_template=False
-        )
-        
-        self.template_type = DocumentType.objects.create(
-            name='Contract Template',
-            category=self.template_category,
-            is_template=True
-        )
+        # Krijo document categories dhe types (një INSERT për tabelë)
+        cls.legal_category, cls.template_category = DocumentCategory.objects.bulk_create([
+            DocumentCategory(
+                name='Legal Documents',
+                description='Official legal documents',
+                color='#007bff'
+            ),
+            DocumentCategory(
+                name='Templates',
+                description='Document templates',
+                color='#28a745'
+            ),
+        ])
+        
+        cls.contract_type, cls.template_type = DocumentType.objects.bulk_create([
+            DocumentType(
+                name='Contract',
+                category=cls.legal_category,
+                is_template=False
+            ),
+            DocumentType(
+                name='Contract Template',
+                category=cls.template_category,
+                is_template=True
+            ),
+        ])
+        # bulk_create nuk dërgon signals, prandaj types_count rillogaritet
+        DocumentCategory.recount_types()
         
         # Krijo document statuses
-        self.draft_status = DocumentStatus.objects.create(
-            name='Draft',
-            color='#ffc107',
-            is_final=False
-        )
+        cls.draft_status, cls.final_status = DocumentStatus.objects.bulk_create([
+            DocumentStatus(
+                name='Draft',
+                color='#ffc107',
+                is_final=False
+            ),
+            DocumentStatus(
+                name='Final',
+                color='#28a745',
+                is_final=True
+            ),
+        ])
         
-        self.final_status = DocumentStatus.objects.create(
-            name='Final',
-            color='#28a745',
-            is_final=True
-        )
+        print("✅ Test data setup complete!")
+    
+    def setUp(self):
+        """APIClient mban gjendjen e autentikimit, prandaj krijohet për çdo test"""
+        from rest_framework.test import APIClient
         
-        # Setup API client
         self.api_client = APIClient()
         
-        print("✅ Test data setup complete!")
+        # Një client i autentikuar për çdo rol, në vend të force_authenticate në çdo test
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(user=self.admin_user)
+        self.lawyer_client = APIClient()
+        self.lawyer_client.force_authenticate(user=self.lawyer_user)
+        self.client_client = APIClient()
+        self.client_client.force_authenticate(user=self.client_user)
+        
+        # Dokumentet e krijuara ripërdoren nga testet që varen prej tyre
+        self._template_id = None
+        self._document_id = None
     
     def test_user_authentication(self):
         """Test user authentication"""
@@ -132,10 +157,10 @@ class SystemTestCase(TestCase):
     
     def test_document_without_case(self):
         """Test krijimin e dokumentit pa case (template ose i përgjithshëm)"""
-        print("\n📄 Testing document creation without case...")
+        if self._template_id:
+            return self._template_id
         
-        # Authenticate si lawyer
-        self.api_client.force_authenticate(user=self.lawyer_user)
+        print("\n📄 Testing document creation without case...")
         
         # Krijo një template
         template_data = {
@@ -154,29 +179,26 @@ class SystemTestCase(TestCase):
         }
         
         # Krijo file content
-        file_content = ContentFile(
-            b'This is a contract template with placeholders for {{client_name}}, {{contract_date}}, and {{amount}}.',
-            name='contract_template.txt'
-        )
+        file_content = ContentFile(_TEMPLATE_BYTES, name='contract_template.txt')
         template_data['file'] = file_content
         
-        response = self.api_client.post('/api/documents/', template_data, format='multipart')
+        response = self.lawyer_client.post('/api/documents/', template_data, format='multipart')
         
         self.assertEqual(response.status_code, 201)
         self.assertTrue(response.data['is_template'])
         self.assertIsNone(response.data.get('case'))  # Nuk duhet të ketë case
         
-        template_id = response.data['id']
-        print(f"✅ Template created successfully with ID: {template_id}")
+        self._template_id = response.data['id']
+        print(f"✅ Template created successfully with ID: {self._template_id}")
         
-        return template_id
+        return self._template_id
     
     def test_document_with_case(self):
         """Test krijimin e dokumentit me case"""
-        print("\n📄 Testing document creation with case...")
+        if self._document_id:
+            return self._document_id
         
-        # Authenticate si lawyer
-        self.api_client.force_authenticate(user=self.lawyer_user)
+        print("\n📄 Testing document creation with case...")
         
         # Krijo dokument të lidhur me case
         document_data = {
@@ -190,13 +212,10 @@ class SystemTestCase(TestCase):
         }
         
         # Krijo file content
-        file_content = ContentFile(
-            b'This is a client agreement contract for the specific case.',
-            name='client_contract.txt'
-        )
+        file_content = ContentFile(_CONTRACT_BYTES, name='client_contract.txt')
         document_data['file'] = file_content
         
-        response = self.api_client.post('/api/documents/', document_data, format='multipart')
+        response = self.lawyer_client.post('/api/documents/', document_data, format='multipart')
         
         self.assertEqual(response.status_code, 201)
         self.assertFalse(response.data['is_template'])
@@ -207,6 +226,7 @@ class SystemTestCase(TestCase):
         # Tani lidh dokumentin me case
         self.test_link_document_to_case(document_id)
         
+        self._document_id = document_id
         return document_id
     
     def test_link_document_to_case(self, document_id):
@@ -214,7 +234,7 @@ class SystemTestCase(TestCase):
         print(f"\n🔗 Testing linking document {document_id} to case...")
         
         # Lidh dokumentin me case
-        response = self.api_client.post(f'/api/cases/{self.case.id}/add-document/', {
+        response = self.lawyer_client.post(f'/api/cases/{self.case.id}/add-document/', {
             'document_id': document_id,
             'relationship_type': 'primary'
         })
@@ -239,7 +259,7 @@ class SystemTestCase(TestCase):
         template_id = self.test_document_without_case()
         
         # Tani krijo dokument nga template
-        response = self.api_client.post('/api/documents/create-from-template/', {
+        response = self.lawyer_client.post('/api/documents/create-from-template/', {
             'template_id': template_id,
             'title': 'Contract for Test Client',
             'case_id': self.case.id,
@@ -273,16 +293,12 @@ class SystemTestCase(TestCase):
         document_id = self.test_document_with_case()
         
         # Provo aksesin si client (duhet të refuzohet)
-        self.api_client.force_authenticate(user=self.client_user)
-        
-        response = self.api_client.get(f'/api/documents/{document_id}/')
+        response = self.client_client.get(f'/api/documents/{document_id}/')
         self.assertEqual(response.status_code, 403)  # Forbidden
         print("✅ Access properly denied for unauthorized user")
         
         # Jep akses si admin
-        self.api_client.force_authenticate(user=self.admin_user)
-        
-        response = self.api_client.post(f'/api/documents/{document_id}/grant-access/', {
+        response = self.admin_client.post(f'/api/documents/{document_id}/grant-access/', {
             'user_id': self.client_user.id,
             'permissions': {
                 'can_view': True,
@@ -296,9 +312,7 @@ class SystemTestCase(TestCase):
         print("✅ Access granted successfully")
         
         # Tani provo aksesin si client (duhet të lejohet)
-        self.api_client.force_authenticate(user=self.client_user)
-        
-        response = self.api_client.get(f'/api/documents/{document_id}/')
+        response = self.client_client.get(f'/api/documents/{document_id}/')
         self.assertEqual(response.status_code, 200)
         print("✅ Access properly allowed after permission grant")
     
@@ -306,27 +320,25 @@ class SystemTestCase(TestCase):
         """Test search dhe filter functionality"""
         print("\n🔍 Testing document search and filtering...")
         
-        self.api_client.force_authenticate(user=self.lawyer_user)
-        
         # Krijo disa dokumente për test
         self.test_document_without_case()  # Template
         self.test_document_with_case()     # Document me case
         
         # Test search by title
-        response = self.api_client.get('/api/documents/', {'search': 'contract'})
+        response = self.lawyer_client.get('/api/documents/', {'search': 'contract'})
         self.assertEqual(response.status_code, 200)
         self.assertGreater(len(response.data['results']), 0)
         print("✅ Search functionality working")
         
         # Test filter by template
-        response = self.api_client.get('/api/documents/', {'is_template': 'true'})
+        response = self.lawyer_client.get('/api/documents/', {'is_template': 'true'})
         self.assertEqual(response.status_code, 200)
         templates = [doc for doc in response.data['results'] if doc['is_template']]
         self.assertGreater(len(templates), 0)
         print("✅ Template filtering working")
         
         # Test filter by case
-        response = self.api_client.get('/api/documents/', {'case': self.case.id})
+        response = self.lawyer_client.get('/api/documents/', {'case': self.case.id})
         self.assertEqual(response.status_code, 200)
         case_docs = response.data['results']
         self.assertGreater(len(case_docs), 0)
@@ -336,14 +348,12 @@ class SystemTestCase(TestCase):
         """Test bulk operations në dokumente"""
         print("\n📦 Testing bulk operations...")
         
-        self.api_client.force_authenticate(user=self.admin_user)
-        
         # Krijo disa dokumente
         doc1_id = self.test_document_without_case()
         doc2_id = self.test_document_with_case()
         
         # Test bulk status change
-        response = self.api_client.post('/api/documents/bulk-action/', {
+        response = self.admin_client.post('/api/documents/bulk-action/', {
             'document_ids': [doc1_id, doc2_id],
             'action': 'change_status',
             'new_status': self.final_status.id
@@ -386,15 +396,23 @@ def run_standalone_tests():
     from django.test.runner import DiscoverRunner
     from django.conf import settings
     
+    # SQLite në memorie: pa I/O në disk për skemën dhe të dhënat.
+    # Testet standalone nuk ekzekutohen mbi backend-in e konfiguruar në settings.
+    settings.DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+    
     # Setup test environment
     setup_test_environment()
     
-    # Create test database
+    # Create test database (në memorie skema krijohet nga e para në çdo ekzekutim)
     test_runner = DiscoverRunner(verbosity=2, interactive=True, keepdb=False)
     old_config = test_runner.setup_databases()
     
     try:
         # Run tests
+        SystemTestCase.setUpTestData()
         test_case = SystemTestCase()
         test_case.setUp()
         result = test_case.run_all_tests()
@@ -410,8 +428,9 @@ def run_standalone_tests():
 # DATA INITIALIZATION SCRIPT
 # ==========================================
 
+@transaction.atomic
 def initialize_test_data():
-    """Inicializo të dhëna test në database"""
+    """Inicializo të dhëna test në database (në një transaksion të vetëm)"""
     print("🏗️  Initializing test data in database...")
     
     # Krijo categories
@@ -422,13 +441,17 @@ def initialize_test_data():
         {'name': 'Client Communications', 'description': 'Communications with clients', 'color': '#fd7e14'},
     ]
     
-    for cat_data in categories:
-        category, created = DocumentCategory.objects.get_or_create(
-            name=cat_data['name'],
-            defaults=cat_data
-        )
-        if created:
-            print(f"✅ Created category: {category.name}")
+    # Një SELECT për emrat ekzistues dhe një INSERT për të rejat
+    existing_categories = set(DocumentCategory.objects.filter(
+        name__in=[cat_data['name'] for cat_data in categories]
+    ).values_list('name', flat=True))
+    new_categories = [
+        DocumentCategory(**cat_data) for cat_data in categories
+        if cat_data['name'] not in existing_categories
+    ]
+    DocumentCategory.objects.bulk_create(new_categories, ignore_conflicts=True, batch_size=500)
+    for category in new_categories:
+        print(f"✅ Created category: {category.name}")
     
     # Krijo document types
     types_data = [
@@ -440,15 +463,28 @@ def initialize_test_data():
         {'name': 'Internal Memo', 'category': 'Internal', 'is_template': False},
     ]
     
-    for type_data in types_data:
-        category = DocumentCategory.objects.get(name=type_data['category'])
-        doc_type, created = DocumentType.objects.get_or_create(
+    # Foreign key vendoset direkt me category_id, pa .get() për çdo rresht
+    category_ids = dict(DocumentCategory.objects.filter(
+        name__in={type_data['category'] for type_data in types_data}
+    ).values_list('name', 'id'))
+    # Filtrimi sipas (name, category) përdor indeksin e unique_together
+    existing_types = set(DocumentType.objects.filter(
+        name__in=[type_data['name'] for type_data in types_data],
+        category_id__in=category_ids.values()
+    ).values_list('name', 'category_id'))
+    new_types = [
+        DocumentType(
             name=type_data['name'],
-            category=category,
-            defaults={'is_template': type_data['is_template']}
+            category_id=category_ids[type_data['category']],
+            is_template=type_data['is_template']
         )
-        if created:
-            print(f"✅ Created document type: {doc_type.name}")
+        for type_data in types_data
+        if (type_data['name'], category_ids[type_data['category']]) not in existing_types
+    ]
+    DocumentType.objects.bulk_create(new_types, ignore_conflicts=True, batch_size=500)
+    DocumentCategory.recount_types(category_ids.values())
+    for doc_type in new_types:
+        print(f"✅ Created document type: {doc_type.name}")
     
     # Krijo statuses
     statuses = [
@@ -459,13 +495,16 @@ def initialize_test_data():
         {'name': 'Archived', 'color': '#6c757d', 'is_final': True},
     ]
     
-    for status_data in statuses:
-        status_obj, created = DocumentStatus.objects.get_or_create(
-            name=status_data['name'],
-            defaults=status_data
-        )
-        if created:
-            print(f"✅ Created status: {status_obj.name}")
+    existing_statuses = set(DocumentStatus.objects.filter(
+        name__in=[status_data['name'] for status_data in statuses]
+    ).values_list('name', flat=True))
+    new_statuses = [
+        DocumentStatus(**status_data) for status_data in statuses
+        if status_data['name'] not in existing_statuses
+    ]
+    DocumentStatus.objects.bulk_create(new_statuses, ignore_conflicts=True, batch_size=500)
+    for status_obj in new_statuses:
+        print(f"✅ Created status: {status_obj.name}")
     
     # Krijo default admin user nëse nuk ekziston
     if not User.objects.filter(username='admin').exists():
@@ -74,25 +74,54 @@ except ImportError:
 # HEALTH CHECK AND STATUS
 # ==========================================
 
-from django.http import JsonResponse
-from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.db import connection, transaction
 from django.utils import timezone
 
+# orjson është opsional: serializon më shpejt dhe kthen bytes direkt
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_response(data, status=200):
+    if orjson is not None:
+        return HttpResponse(orjson.dumps(data), content_type='application/json', status=status)
+    return JsonResponse(data, status=status)
+
+_HEALTHY_RESPONSE = {
+    'status': 'healthy',
+    'database': 'connected',
+    'version': '1.0.0',
+}
+
+# Koha maksimale e probe-it të databazës (PostgreSQL)
+HEALTH_CHECK_DB_TIMEOUT = '500ms'
+
+def _check_database():
+    connection.ensure_connection()
+    
+    if connection.vendor == 'postgresql':
+        # Një DB e ngadaltë nuk duhet ta bllokojë probe-in pa kufi
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = '{HEALTH_CHECK_DB_TIMEOUT}'")
+            cursor.execute("SELECT 1")
+    elif not connection.is_usable():
+        raise ConnectionError("Database connection is not usable")
+
+def liveness_check(request):
+    """Liveness probe: procesi është gjallë, pa prekur databazën"""
+    return HttpResponse(b'OK', content_type='text/plain')
+
 def health_check(request):
-    """Health check endpoint për monitoring"""
+    """Health check endpoint për monitoring (readiness, përfshin databazën)"""
     try:
-        # Test database connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
+        # Test database connection (ripërdor lidhjen ekzistuese)
+        _check_database()
         
-        return JsonResponse({
-            'status': 'healthy',
-            'timestamp': timezone.now().isoformat(),
-            'database': 'connected',
-            'version': '1.0.0'
-        })
+        return _json_response({**_HEALTHY_RESPONSE, 'timestamp': timezone.now().isoformat()})
     except Exception as e:
-        return JsonResponse({
+        return _json_response({
             'status': 'unhealthy',
             'timestamp': timezone.now().isoformat(),
             'error': str(e)
@@ -121,5 +150,7 @@ def api_info(request):
 
 urlpatterns += [
     path('api/health/', health_check, name='health_check'),
+    path('api/health/live/', liveness_check, name='health_live'),
+    path('api/health/ready/', health_check, name='health_ready'),
     path('api/', api_info, name='api_info'),
 ]
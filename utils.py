@@ -1,24 +1,97 @@
 # utils.py - Utility Functions për Legal Case Manager
+import csv
 import os
 import hashlib
+import io
+import json
 import uuid
 import mimetypes
+import operator
+import re
+import threading
+import time
 import magic
-from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
+import numpy as np
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial, reduce
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.core.files.uploadedfile import UploadedFile
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q, QuerySet
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, QuerySet
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
 import logging
 
+# Libraritë për ekstraktim teksti janë opsionale
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+try:
+    from docx import Document as DocxDocument
+except ImportError:
+    DocxDocument = None
+
+# orjson është opsional; orjson.JSONDecodeError trashëgon json.JSONDecodeError
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# hyperscan është opsional: validon të gjitha email-et e një batch-i me një skanim DFA
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
+# Një instancë libmagic për të gjithë procesin (databaza e magic ngarkohet një herë)
+_MIME_DETECTOR = magic.Magic(mime=True)
+MIME_SNIFF_BYTES = 2048
+
+# Vlerat e LEGAL_MANAGER lexohen një herë, jo në çdo upload
+_MAX_DOCUMENT_SIZE_BYTES = 0
+_ALLOWED_DOCUMENT_TYPES = frozenset()
+
+def _load_legal_manager_settings():
+    global _MAX_DOCUMENT_SIZE_BYTES, _ALLOWED_DOCUMENT_TYPES
+    
+    config = settings.LEGAL_MANAGER
+    _MAX_DOCUMENT_SIZE_BYTES = config.get('MAX_DOCUMENT_SIZE_MB', 50) * 1024 * 1024  # Convert to bytes
+    _ALLOWED_DOCUMENT_TYPES = frozenset(config.get('ALLOWED_DOCUMENT_TYPES', []))
+
+@receiver(setting_changed)
+def _reload_legal_manager_settings(sender, setting, **kwargs):
+    """Rifreskon vlerat e cache-uara kur testet ndryshojnë LEGAL_MANAGER"""
+    if setting == 'LEGAL_MANAGER':
+        _load_legal_manager_settings()
+
+_load_legal_manager_settings()
+
+# Regex patterns të kompiluara një herë në import
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_FN_DASH_RE = re.compile(r'[-\s]+')
+_TPL_VAR_RE = re.compile(r'\{\{(\w+)\}\}')
+
+# I njëjti regex email-i, i kompiluar një herë si databazë hyperscan (^/$ për çdo rresht)
+if hyperscan is not None:
+    _EMAIL_HS_DB = hyperscan.Database()
+    _EMAIL_HS_DB.compile(expressions=[_EMAIL_RE.pattern.encode()], flags=[hyperscan.HS_FLAG_MULTILINE])
+else:
+    _EMAIL_HS_DB = None
+
 # ==========================================
 # FILE HANDLING UTILITIES
 # ==========================================
@@ -37,7 +110,7 @@ def validate_document_file(uploaded_file: UploadedFile) -> Dict[str, Any]:
     }
     
     # Check file size
-    max_size = settings.LEGAL_MANAGER.get('MAX_DOCUMENT_SIZE_MB', 50) * 1024 * 1024  # Convert to bytes
+    max_size = _MAX_DOCUMENT_SIZE_BYTES
     if uploaded_file.size > max_size:
         result['errors'].append(f"File size exceeds maximum allowed size of {max_size // (1024*1024)}MB")
         return result
@@ -45,15 +118,14 @@ def validate_document_file(uploaded_file: UploadedFile) -> Dict[str, Any]:
     # Detect file type
     try:
         # Use python-magic për file type detection
-        mime_type = magic.from_buffer(uploaded_file.read(1024), mime=True)
+        mime_type = _MIME_DETECTOR.from_buffer(uploaded_file.read(MIME_SNIFF_BYTES))
         uploaded_file.seek(0)  # Reset file pointer
         
         # Get file extension
         file_extension = os.path.splitext(uploaded_file.name)[1].lower().lstrip('.')
         
         # Check if file type is allowed
-        allowed_types = settings.LEGAL_MANAGER.get('ALLOWED_DOCUMENT_TYPES', [])
-        if file_extension not in allowed_types:
+        if file_extension not in _ALLOWED_DOCUMENT_TYPES:
             result['errors'].append(f"File type '{file_extension}' is not allowed")
             return result
         
@@ -75,18 +147,42 @@ def validate_document_file(uploaded_file: UploadedFile) -> Dict[str, Any]:
     
     return result
 
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
 def calculate_file_hash(uploaded_file: UploadedFile) -> str:
     """
     Llogarit SHA-256 hash të file-it për duplicate detection
     """
-    hash_sha256 = hashlib.sha256()
+    uploaded_file.seek(0)
     
-    # Read file në chunks për të mos ngarkuar të gjithë file-in në memory
-    for chunk in uploaded_file.chunks():
-        hash_sha256.update(chunk)
+    if hasattr(hashlib, 'file_digest'):
+        # Python 3.11+: cikli i leximit ekzekutohet në C
+        file_hash = hashlib.file_digest(uploaded_file, 'sha256').hexdigest()
+    else:
+        # Read file në chunks për të mos ngarkuar të gjithë file-in në memory,
+        # duke ripërdorur të njëjtin buffer për çdo chunk
+        hash_sha256 = hashlib.sha256()
+        buffer = memoryview(bytearray(HASH_CHUNK_SIZE))
+        while True:
+            size = uploaded_file.readinto(buffer)
+            if not size:
+                break
+            hash_sha256.update(buffer[:size])
+        file_hash = hash_sha256.hexdigest()
     
     uploaded_file.seek(0)  # Reset file pointer
-    return hash_sha256.hexdigest()
+    return file_hash
+
+# (epoch second, timestamp i formatuar) - rifreskohet një herë në sekondë
+_filename_timestamp_cache = (0, '')
+
+def _filename_timestamp() -> str:
+    global _filename_timestamp_cache
+    
+    second = int(time.time())
+    if _filename_timestamp_cache[0] != second:
+        _filename_timestamp_cache = (second, datetime.fromtimestamp(second).strftime('%Y%m%d_%H%M%S'))
+    return _filename_timestamp_cache[1]
 
 def generate_unique_filename(original_filename: str, user_id: int = None) -> str:
     """
@@ -96,14 +192,17 @@ def generate_unique_filename(original_filename: str, user_id: int = None) -> str
     name, ext = os.path.splitext(original_filename)
     
     # Create unique identifier
-    unique_id = str(uuid.uuid4())[:8]
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_id = uuid.uuid4().hex[:12]
+    timestamp = _filename_timestamp()
     
     if user_id:
         return f"{timestamp}_{user_id}_{unique_id}_{name}{ext}"
     else:
         return f"{timestamp}_{unique_id}_{name}{ext}"
 
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+_SIZE_SCALES = tuple(1 << (10 * i) for i in range(len(_SIZE_UNITS)))
+
 def format_file_size(size_bytes: int) -> str:
     """
     Formatizuje file size në human-readable format
@@ -111,14 +210,63 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
+    # floor(log1024(size)) nga numri i bit-eve, pa cikël pjesëtimesh
     i = 0
+    if size_bytes >= 1024:
+        i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
     
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
+    return f"{size_bytes / _SIZE_SCALES[i]:.1f} {_SIZE_UNITS[i]}"
+
+# PDF-të me më shumë faqe se kjo ekstraktohen paralelisht
+PDF_PARALLEL_MIN_PAGES = 8
+
+def _extract_pdf_page_range(pdf_data: bytes, start: int, stop: int) -> str:
+    # Çdo thread ka reader-in e vet: PdfReader lexon stream-in me seek dhe nuk ndahet
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_data))
+    return "".join(pdf_reader.pages[i].extract_text() or "" for i in range(start, stop))
+
+def _extract_pdf_text(file_path: str) -> Optional[str]:
+    if PyPDF2 is None:
+        logger.warning("PyPDF2 not installed, cannot extract PDF content")
+        return None
     
-    return f"{size_bytes:.1f} {size_names[i]}"
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+        if page_count <= PDF_PARALLEL_MIN_PAGES:
+            return "".join(page.extract_text() or "" for page in pdf_reader.pages)
+        
+        file.seek(0)
+        pdf_data = file.read()
+    
+    workers = min(os.cpu_count() or 1, page_count)
+    pages_per_worker = -(-page_count // workers)
+    ranges = [
+        (start, min(start + pages_per_worker, page_count))
+        for start in range(0, page_count, pages_per_worker)
+    ]
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        return "".join(executor.map(lambda r: _extract_pdf_page_range(pdf_data, *r), ranges))
+
+def _extract_docx_text(file_path: str) -> Optional[str]:
+    if DocxDocument is None:
+        logger.warning("python-docx not installed, cannot extract Word content")
+        return None
+    
+    doc = DocxDocument(file_path)
+    return "".join(f"{paragraph.text}\n" for paragraph in doc.paragraphs)
+
+def _extract_txt_text(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+# Extension -> funksioni i ekstraktimit
+_TEXT_EXTRACTORS = {
+    '.pdf': _extract_pdf_text,
+    '.doc': _extract_docx_text,
+    '.docx': _extract_docx_text,
+    '.txt': _extract_txt_text,
+}
 
 def extract_text_from_file(file_path: str) -> Optional[str]:
     """
@@ -126,31 +274,13 @@ def extract_text_from_file(file_path: str) -> Optional[str]:
     """
     try:
         file_extension = os.path.splitext(file_path)[1].lower()
+        extractor = _TEXT_EXTRACTORS.get(file_extension)
         
-        if file_extension == '.pdf':
-            import PyPDF2
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text
-                
-        elif file_extension in ['.doc', '.docx']:
-            from docx import Document
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-            
-        elif file_extension == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
-                
-        else:
+        if extractor is None:
             logger.warning(f"Text extraction not supported for file type: {file_extension}")
             return None
+        
+        return extractor(file_path)
             
     except Exception as e:
         logger.error(f"Error extracting text from file {file_path}: {str(e)}")
@@ -160,6 +290,10 @@ def extract_text_from_file(file_path: str) -> Optional[str]:
 # SEARCH & FILTERING UTILITIES
 # ==========================================
 
+# Rolet që shohin dokumentet 'internal' dhe nivelet e aksesit të dukshme për to
+INTERNAL_ROLES = frozenset({'lawyer', 'paralegal'})
+SHAREABLE_ACCESS_LEVELS = ('public', 'internal')
+
 def build_search_query(model_class, search_fields: List[str], search_term: str) -> Q:
     """
     Ndërton Q object për search në multiple fields
@@ -167,31 +301,42 @@ def build_search_query(model_class, search_fields: List[str], search_term: str)
     if not search_term:
         return Q()
     
-    query = Q()
+    # Lookup keys ndërtohen një herë, jo për çdo term
+    lookups = [f"{field}__icontains" for field in search_fields]
     search_terms = search_term.split()
     
+    if len(search_terms) == 1 and len(lookups) == 1:
+        return Q(**{lookups[0]: search_terms[0]})
+    
+    query = Q()
     for term in search_terms:
-        term_query = Q()
-        for field in search_fields:
-            term_query |= Q(**{f"{field}__icontains": term})
-        query &= term_query
+        query &= reduce(operator.or_, (Q(**{lookup: term}) for lookup in lookups), Q())
     
     return query
 
+def _parse_filter_date(value: str) -> date:
+    # fromisoformat është më i shpejtë, por pranon vetëm datat me zero (2024-01-05);
+    # strptime pranon edhe 2024-1-5, si më parë
+    if len(value) == 10 and value[4] == value[7] == '-':
+        return date.fromisoformat(value)
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
 def apply_date_filters(queryset: QuerySet, date_field: str, date_params: Dict[str, str]) -> QuerySet:
     """
-    Aplikor date filters në queryset
+    Aplikor date filters në queryset (formati %Y-%m-%d, me ose pa zero përpara)
     """
-    if 'start_date' in date_params and date_params['start_date']:
+    start_param = date_params.get('start_date')
+    if start_param:
         try:
-            start_date = datetime.strptime(date_params['start_date'], '%Y-%m-%d').date()
+            start_date = _parse_filter_date(start_param)
             queryset = queryset.filter(**{f"{date_field}__gte": start_date})
         except ValueError:
             pass
     
-    if 'end_date' in date_params and date_params['end_date']:
+    end_param = date_params.get('end_date')
+    if end_param:
         try:
-            end_date = datetime.strptime(date_params['end_date'], '%Y-%m-%d').date()
+            end_date = _parse_filter_date(end_param)
             queryset = queryset.filter(**{f"{date_field}__lte": end_date})
         except ValueError:
             pass
@@ -211,16 +356,23 @@ def get_user_accessible_objects(user, model_class, field_name: str = 'created_by
         if model_class.__name__ == 'Case':
             return queryset.filter(client__user=user)
         elif model_class.__name__ == 'Document':
-            return queryset.filter(
+            from .models_improved import DocumentCaseRelation
+            
+            # Exists ekzekutohet si semi-join, pa JOIN + DISTINCT mbi dokumentet
+            client_relations = DocumentCaseRelation.objects.filter(
+                document=OuterRef('pk'),
+                case__client__user=user
+            )
+            return queryset.select_related('created_by', 'document_type', 'status').filter(
                 Q(**{f"{field_name}": user}) |
                 Q(access_level='public') |
-                Q(documentcaserelation__case__client__user=user)
-            ).distinct()
+                Exists(client_relations)
+            )
     else:
         # Lawyer/paralegal shohin objektet e tyre dhe ato public
         return queryset.filter(
             Q(**{f"{field_name}": user}) |
-            Q(access_level__in=['public', 'internal'])
+            Q(access_level__in=SHAREABLE_ACCESS_LEVELS)
         ).distinct()
     
     return queryset.none()
@@ -229,132 +381,226 @@ def get_user_accessible_objects(user, model_class, field_name: str = 'created_by
 # PERMISSION UTILITIES
 # ==========================================
 
-def check_document_permission(user, document, action: str) -> bool:
+PERMISSION_ACTIONS = ('view', 'download', 'edit', 'delete', 'share')
+READ_ACTIONS = frozenset({'view', 'download'})
+
+# Kolonat e DocumentAccess që duhen për vlerësimin e permissions
+_ACCESS_ROW_FIELDS = ('user_id', 'role') + tuple(f'can_{action}' for action in PERMISSION_ACTIONS)
+
+def _has_implicit_permission(user, document, action: str) -> bool:
     """
-    Kontrollon nëse user ka permission për action në document
-    
-    Args:
-        user: User object
-        document: Document object
-        action: 'view', 'download', 'edit', 'delete', 'share'
+    Kontrollon akseset që nuk varen nga DocumentAccess (rol, krijues, access level)
     """
     # Admin ka akses të plotë
     if user.role == 'admin':
         return True
     
-    # Krijuesi ka akses të plotë
-    if document.created_by == user:
+    # Krijuesi ka akses të plotë (krahasim me ID, pa ngarkuar created_by)
+    if document.created_by_id == user.id:
         return True
     
     # Kontrollo access level
-    if action in ['view', 'download']:
+    if action in READ_ACTIONS:
         if document.access_level == 'public':
             return True
         
-        if document.access_level == 'internal' and user.role in ['lawyer', 'paralegal']:
+        if document.access_level == 'internal' and user.role in INTERNAL_ROLES:
             return True
     
-    # Kontrollo access controls specifike
+    return False
+
+def _select_document_access(access_rows, user):
+    """
+    Zgjedh rreshtin DocumentAccess që vlen për user-in: user-specific para role-based
+    """
+    role_access = None
+    for access in access_rows:
+        if access['user_id'] == user.id:
+            return access
+        if role_access is None and access['role'] == user.role:
+            role_access = access
+    return role_access
+
+def _has_access_permission(access, action: str) -> bool:
+    # Rreshtat e skaduar janë filtruar tashmë në query
+    return bool(access and access.get(f'can_{action}'))
+
+def _active_access_q() -> Q:
+    # Akseset e skaduara filtrohen në WHERE, jo pasi janë lexuar nga databaza
+    return Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+
+def _document_access_rows(user, document):
     from .models_improved import DocumentAccess
     
-    # User-specific access
-    user_access = DocumentAccess.objects.filter(document=document, user=user).first()
-    if user_access:
-        if user_access.expires_at and user_access.expires_at < timezone.now():
-            return False  # Access expired
-        
-        return getattr(user_access, f'can_{action}', False)
+    return list(DocumentAccess.objects.filter(document=document).filter(
+        _active_access_q(),
+        Q(user=user) | Q(role=user.role)
+    ).values(*_ACCESS_ROW_FIELDS))
+
+def check_document_permission(user, document, action: str) -> bool:
+    """
+    Kontrollon nëse user ka permission për action në document
     
-    # Role-based access
-    role_access = DocumentAccess.objects.filter(document=document, role=user.role).first()
-    if role_access:
-        if role_access.expires_at and role_access.expires_at < timezone.now():
-            return False  # Access expired
-        
-        return getattr(role_access, f'can_{action}', False)
+    Args:
+        user: User object
+        document: Document object
+        action: 'view', 'download', 'edit', 'delete', 'share'
+    """
+    if _has_implicit_permission(user, document, action):
+        return True
     
-    return False
+    # Kontrollo access controls specifike (user-specific dhe role-based në një query)
+    access = _select_document_access(_document_access_rows(user, document), user)
+    return _has_access_permission(access, action)
+
+def _build_document_permissions(user, document, load_access_rows) -> Dict[str, bool]:
+    implicit = {action: _has_implicit_permission(user, document, action) for action in PERMISSION_ACTIONS}
+    
+    # Admin dhe krijuesi nuk kanë nevojë për DocumentAccess
+    if all(implicit.values()):
+        return {f'can_{action}': True for action in PERMISSION_ACTIONS}
+    
+    access = _select_document_access(load_access_rows(), user)
+    return {
+        f'can_{action}': implicit[action] or _has_access_permission(access, action)
+        for action in PERMISSION_ACTIONS
+    }
 
 def get_user_permissions_for_document(user, document) -> Dict[str, bool]:
     """
     Merr të gjitha permissions që user ka për dokumentin
     """
-    permissions = {
-        'can_view': check_document_permission(user, document, 'view'),
-        'can_download': check_document_permission(user, document, 'download'),
-        'can_edit': check_document_permission(user, document, 'edit'),
-        'can_delete': check_document_permission(user, document, 'delete'),
-        'can_share': check_document_permission(user, document, 'share'),
-    }
+    return _build_document_permissions(
+        user, document, partial(_document_access_rows, user, document)
+    )
+
+def get_user_permissions_for_documents(user, documents) -> Dict[int, Dict[str, bool]]:
+    """
+    Merr permissions për shumë dokumente me një query të vetme në DocumentAccess
+    
+    Returns:
+        Dict {document_id: permissions}
+    """
+    from .models_improved import DocumentAccess
+    
+    documents = list(documents)
+    access_by_document = {}
+    if user.role != 'admin':
+        access_rows = DocumentAccess.objects.filter(
+            document__in=[document.pk for document in documents]
+        ).filter(
+            _active_access_q(),
+            Q(user=user) | Q(role=user.role)
+        ).values('document_id', *_ACCESS_ROW_FIELDS)
+        for access in access_rows:
+            access_by_document.setdefault(access['document_id'], []).append(access)
     
-    return permissions
+    return {
+        document.pk: _build_document_permissions(
+            user, document, partial(access_by_document.get, document.pk, ())
+        )
+        for document in documents
+    }
 
 # ==========================================
 # DATA EXPORT UTILITIES
 # ==========================================
 
-def export_cases_to_csv(queryset: QuerySet) -> str:
+EXPORT_CHUNK_SIZE = 2000
+
+class _Echo:
+    """Pseudo-buffer për csv.writer: kthen rreshtin në vend që ta ruajë"""
+    
+    def write(self, value):
+        return value
+
+def _field_choices(model_class, field_name: str) -> Dict[Any, str]:
+    return dict(model_class._meta.get_field(field_name).flatchoices)
+
+def stream_cases_csv(queryset: QuerySet) -> Iterator[str]:
     """
-    Eksporton rastet në CSV format
+    Gjeneron rastet në CSV format rresht pas rreshti
     """
-    import csv
-    import io
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
+    writer = csv.writer(_Echo())
     
     # Headers
-    writer.writerow([
+    yield writer.writerow([
         'UID', 'Title', 'Client', 'Assigned To', 'Case Type', 
         'Status', 'Created At', 'Updated At'
     ])
     
+    # Display labels zgjidhen nga choices, pa instancuar modelin për çdo rresht
+    case_types = _field_choices(queryset.model, 'case_type')
+    statuses = _field_choices(queryset.model, 'status')
+    
     # Data
-    for case in queryset.select_related('client', 'assigned_to'):
-        writer.writerow([
-            case.uid,
-            case.title,
-            case.client.full_name,
-            case.assigned_to.username if case.assigned_to else '',
-            case.get_case_type_display(),
-            case.get_status_display(),
-            case.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            case.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+    rows = queryset.values_list(
+        'uid', 'title', 'client__full_name', 'assigned_to__username',
+        'case_type', 'status', 'created_at', 'updated_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for uid, title, client_name, assigned_to, case_type, status_value, created_at, updated_at in rows:
+        yield writer.writerow([
+            uid,
+            title,
+            client_name,
+            assigned_to or '',
+            case_types.get(case_type, case_type),
+            statuses.get(status_value, status_value),
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            updated_at.strftime('%Y-%m-%d %H:%M:%S')
         ])
-    
-    return output.getvalue()
 
-def export_documents_to_csv(queryset: QuerySet) -> str:
+def stream_documents_csv(queryset: QuerySet) -> Iterator[str]:
     """
-    Eksporton dokumentet në CSV format
+    Gjeneron dokumentet në CSV format rresht pas rreshti
     """
-    import csv
-    import io
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
+    writer = csv.writer(_Echo())
     
     # Headers
-    writer.writerow([
+    yield writer.writerow([
         'UID', 'Title', 'Document Type', 'Status', 'Is Template',
         'Access Level', 'Created By', 'File Size', 'Created At'
     ])
     
+    access_levels = _field_choices(queryset.model, 'access_level')
+    
     # Data
-    for doc in queryset.select_related('document_type', 'status', 'created_by'):
-        writer.writerow([
-            doc.uid,
-            doc.title,
-            doc.document_type.name,
-            doc.status.name,
-            'Yes' if doc.is_template else 'No',
-            doc.get_access_level_display(),
-            doc.created_by.username if doc.created_by else '',
-            format_file_size(doc.file_size) if doc.file_size else '',
-            doc.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    rows = queryset.values_list(
+        'uid', 'title', 'document_type__name', 'status__name', 'is_template',
+        'access_level', 'created_by__username', 'file_size', 'created_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for uid, title, type_name, status_name, is_template, access_level, created_by, file_size, created_at in rows:
+        yield writer.writerow([
+            uid,
+            title,
+            type_name,
+            status_name,
+            'Yes' if is_template else 'No',
+            access_levels.get(access_level, access_level),
+            created_by or '',
+            format_file_size(file_size) if file_size else '',
+            created_at.strftime('%Y-%m-%d %H:%M:%S')
         ])
-    
-    return output.getvalue()
+
+def csv_streaming_response(rows: Iterator[str], filename: str) -> StreamingHttpResponse:
+    """
+    Kthen CSV si StreamingHttpResponse, pa e mbajtur të gjithë file-in në memory
+    """
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def export_cases_to_csv(queryset: QuerySet) -> str:
+    """
+    Eksporton rastet në CSV format
+    """
+    return ''.join(stream_cases_csv(queryset))
+
+def export_documents_to_csv(queryset: QuerySet) -> str:
+    """
+    Eksporton dokumentet në CSV format
+    """
+    return ''.join(stream_documents_csv(queryset))
 
 # ==========================================
 # DATE & TIME UTILITIES
@@ -364,58 +610,116 @@ def get_business_days_between(start_date: datetime, end_date: datetime) -> int:
     """
     Llogarit ditët e punës midis dy datave
     """
-    from datetime import timedelta
+    start_day = start_date.date()
+    end_day = end_date.date()
     
-    business_days = 0
-    current_date = start_date.date()
-    end_date = end_date.date()
+    if start_day > end_day:
+        return 0
     
-    while current_date <= end_date:
-        if current_date.weekday() < 5:  # Monday = 0, Sunday = 6
-            business_days += 1
-        current_date += timedelta(days=1)
+    # busday_count përjashton datën e fundit, prandaj shtohet një ditë
+    return int(np.busday_count(start_day, end_day + timedelta(days=1)))
+
+def _as_day_array(dates) -> np.ndarray:
+    return np.array(
+        [value.date() if isinstance(value, datetime) else value for value in dates],
+        dtype='datetime64[D]',
+    )
+
+def business_days_batch(start_dates, end_dates) -> np.ndarray:
+    """
+    Llogarit ditët e punës për shumë çifte datash njëherësh (p.sh. dashboard-i analitik)
     
-    return business_days
+    Returns:
+        np.ndarray me të njëjtat vlera si get_business_days_between për çdo çift
+    """
+    start_days = _as_day_array(start_dates)
+    end_days = _as_day_array(end_dates)
+    
+    counts = np.busday_count(start_days, end_days + np.timedelta64(1, 'D'))
+    return np.where(start_days > end_days, 0, counts)
 
 def get_next_business_day(date: datetime, days_ahead: int = 1) -> datetime:
     """
     Merr ditën e ardhshme të punës
     """
-    from datetime import timedelta
+    if days_ahead <= 0:
+        return date
     
-    current_date = date
-    days_added = 0
+    # Nga fundjava numërohet njësoj si nga e premtja paraardhëse
+    weekday = date.weekday()
+    if weekday >= 5:
+        date -= timedelta(days=weekday - 4)
+        weekday = 4
     
-    while days_added < days_ahead:
-        current_date += timedelta(days=1)
-        if current_date.weekday() < 5:  # Business day
-            days_added += 1
+    weeks, remaining_days = divmod(days_ahead, 5)
+    offset = weeks * 7 + remaining_days
+    if weekday + remaining_days >= 5:
+        offset += 2  # Kapërce fundjavën
     
-    return current_date
+    return date + timedelta(days=offset)
 
-def is_deadline_approaching(deadline: datetime, warning_days: int = 3) -> Dict[str, Any]:
+# Pragjet (në ditë, përfshirëse) dhe nivelet përkatëse të urgjencës
+_URG_THR = (1, 3, 7)
+_URG_LEVELS = ('critical', 'high', 'medium', 'low')
+
+def is_deadline_approaching(deadline: datetime, warning_days: int = 3, *,
+                            now: datetime = None) -> Dict[str, Any]:
     """
     Kontrollon nëse deadline po afrohet
+    
+    Args:
+        now: koha aktuale; kur kontrollohen shumë deadline-e jepet një herë nga thirrësi
     """
-    now = timezone.now()
+    if now is None:
+        now = timezone.now()
     days_until = (deadline - now).days
     
     return {
-        'is_approaching': days_until <= warning_days and days_until >= 0,
+        'is_approaching': 0 <= days_until <= warning_days,
         'is_overdue': days_until < 0,
         'days_until': days_until,
-        'urgency_level': (
-            'critical' if days_until <= 1 else
-            'high' if days_until <= 3 else
-            'medium' if days_until <= 7 else
-            'low'
-        )
+        'urgency_level': _URG_LEVELS[bisect_left(_URG_THR, days_until)],
     }
 
 # ==========================================
 # VALIDATION UTILITIES
 # ==========================================
 
+_email_hs_state = threading.local()
+
+def _email_hyperscan_scratch():
+    # Scratch space i hyperscan nuk mund të ndahet midis thread-eve
+    scratch = getattr(_email_hs_state, 'scratch', None)
+    if scratch is None:
+        scratch = _email_hs_state.scratch = hyperscan.Scratch(_EMAIL_HS_DB)
+    return scratch
+
+def _hyperscan_valid_email_flags(emails: List[str]) -> List[bool]:
+    """
+    Skanon të gjitha email-et me një thirrje hyperscan (një për rresht)
+    """
+    scratch = _email_hyperscan_scratch()
+    
+    # Offset-i ku mbaron çdo email në buffer-in e bashkuar me '\n'
+    line_ends = {}
+    offset = -1
+    encoded = []
+    for index, email in enumerate(emails):
+        data = email.encode()
+        encoded.append(data)
+        offset += len(data) + 1
+        line_ends[offset] = index
+    
+    flags = [False] * len(emails)
+    
+    def on_match(expression_id, start, end, match_flags, context):
+        index = line_ends.get(end)
+        if index is not None:
+            flags[index] = True
+    
+    _EMAIL_HS_DB.scan(b'\n'.join(encoded), match_event_handler=on_match, scratch=scratch)
+    return flags
+
 def validate_email_list(email_string: str) -> Tuple[List[str], List[str]]:
     """
     Validon listë email-esh të ndarë me virgulë
@@ -423,16 +727,20 @@ def validate_email_list(email_string: str) -> Tuple[List[str], List[str]]:
     Returns:
         Tuple: (valid_emails, invalid_emails)
     """
-    import re
-    
-    email_regex = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-    
     emails = [email.strip() for email in email_string.split(',') if email.strip()]
     valid_emails = []
     invalid_emails = []
     
+    if hyperscan is not None and emails:
+        # Një '\n' brenda email-it do të ndante rreshtin; regex-i nuk e pranon gjithsesi
+        flags = _hyperscan_valid_email_flags([email.replace('\n', '\r') for email in emails])
+        for email, is_valid in zip(emails, flags):
+            (valid_emails if is_valid else invalid_emails).append(email)
+        return valid_emails, invalid_emails
+    
     for email in emails:
-        if email_regex.match(email):
+        # Filtër i lirë para regex-it: email-i valid ka saktësisht një '@'
+        if email.count('@') == 1 and _EMAIL_RE.match(email):
             valid_emails.append(email)
         else:
             invalid_emails.append(email)
@@ -447,8 +755,7 @@ def validate_json_field(value: str) -> Any:
         return {}
     
     try:
-        import json
-        return json.loads(value)
+        return _json_loads(value)
     except json.JSONDecodeError as e:
         raise ValidationError(f"Invalid JSON format: {str(e)}")
 
@@ -456,6 +763,14 @@ def validate_json_field(value: str) -> Any:
 # API UTILITIES
 # ==========================================
 
+_STATUS_MSG = {
+    400: 'Bad Request',
+    401: 'Authentication required',
+    403: 'Permission denied',
+    404: 'Resource not found',
+    500: 'Internal server error',
+}
+
 def custom_exception_handler(exc, context):
     """
     Custom exception handler për DRF
@@ -467,45 +782,53 @@ def custom_exception_handler(exc, context):
         custom_response_data = {
             'error': {
                 'status_code': response.status_code,
-                'message': 'An error occurred',
+                # Specific error messages për common cases
+                'message': _STATUS_MSG.get(response.status_code, 'An error occurred'),
                 'details': response.data
             }
         }
         
-        # Add specific error messages për common cases
-        if response.status_code == 400:
-            custom_response_data['error']['message'] = 'Bad Request'
-        elif response.status_code == 401:
-            custom_response_data['error']['message'] = 'Authentication required'
-        elif response.status_code == 403:
-            custom_response_data['error']['message'] = 'Permission denied'
-        elif response.status_code == 404:
-            custom_response_data['error']['message'] = 'Resource not found'
-        elif response.status_code == 500:
-            custom_response_data['error']['message'] = 'Internal server error'
-        
         response.data = custom_response_data
     
     return response
 
-def paginate_queryset(queryset: QuerySet, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+PAGINATION_COUNT_CACHE_TIMEOUT = 60  # sekonda
+
+def paginate_queryset(queryset: QuerySet, page: int = 1, page_size: int = 20,
+                      count_cache_key: str = None) -> Dict[str, Any]:
     """
     Manual pagination për queryset
+    
+    Args:
+        count_cache_key: nëse jepet, COUNT(*) ruhet në cache me këtë key
     """
-    from django.core.paginator import Paginator
+    if count_cache_key:
+        total_count = cache.get(count_cache_key)
+        if total_count is None:
+            total_count = queryset.count()
+            cache.set(count_cache_key, total_count, PAGINATION_COUNT_CACHE_TIMEOUT)
+    else:
+        total_count = queryset.count()
     
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    # Njësoj si Paginator.get_page: faqja jo-numër jep të parën (p.sh. request.GET['page']),
+    # të paktën një faqe, faqja jashtë intervalit jep të fundit
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        page = 1
+    total_pages = max(1, -(-total_count // page_size))
+    current_page = page if 1 <= page <= total_pages else total_pages
+    offset = (current_page - 1) * page_size
     
     return {
-        'results': list(page_obj),
+        'results': list(queryset[offset:offset + page_size]),
         'pagination': {
             'page': page,
             'page_size': page_size,
-            'total_pages': paginator.num_pages,
-            'total_count': paginator.count,
-            'has_next': page_obj.has_next(),
-            'has_previous': page_obj.has_previous(),
+            'total_pages': total_pages,
+            'total_count': total_count,
+            'has_next': current_page < total_pages,
+            'has_previous': current_page > 1,
         }
     }
 
@@ -513,36 +836,55 @@ def paginate_queryset(queryset: QuerySet, page: int = 1, page_size: int = 20) ->
 # SECURITY UTILITIES
 # ==========================================
 
+class _FilenameCharTable(dict):
+    """
+    Tabelë për str.translate që mban vetëm karakteret e sigurta (word chars, whitespace, '.', '-').
+    Ruhen paraprakisht vetëm ASCII/Latin-1; karakteret e tjera llogariten pa u ruajtur,
+    që emrat e skedarëve nga jashtë të mos e rrisin tabelën pa kufi.
+    """
+    
+    def __init__(self):
+        super().__init__((codepoint, self._safe(codepoint)) for codepoint in range(256))
+    
+    @staticmethod
+    def _safe(codepoint):
+        char = chr(codepoint)
+        return char if (char.isalnum() or char.isspace() or char in '_.-') else None
+    
+    def __missing__(self, codepoint):
+        return self._safe(codepoint)
+
+_FILENAME_CHAR_TABLE = _FilenameCharTable()
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename për siguri
     """
-    import re
-    
     # Remove or replace unsafe characters
-    filename = re.sub(r'[^\w\s-.]', '', filename)
-    filename = re.sub(r'[-\s]+', '-', filename)
+    filename = filename.translate(_FILENAME_CHAR_TABLE)
+    filename = _FN_DASH_RE.sub('-', filename)
     
     return filename
 
+_META_FORWARDED_FOR = 'HTTP_X_FORWARDED_FOR'
+_META_REMOTE_ADDR = 'REMOTE_ADDR'
+
 def get_client_ip(request) -> str:
     """
     Merr IP address të klientit
     """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    x_forwarded_for = request.META.get(_META_FORWARDED_FOR)
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
+        # Vetëm adresa e parë, pa ndarë të gjithë zinxhirin e proxy-ve
+        ip = x_forwarded_for.partition(',')[0].strip()
     else:
-        ip = request.META.get('REMOTE_ADDR')
+        ip = request.META.get(_META_REMOTE_ADDR)
     return ip
 
-def log_user_action(user, action: str, target_type: str = None, target_id: str = None, 
-                   metadata: Dict[str, Any] = None, request=None):
-    """
-    Log user action në audit log
-    """
-    from .models_improved import AuditLog
-    
+AUDIT_LOG_BATCH_SIZE = 500
+
+def _audit_log_data(user, action: str, target_type: str = None, target_id: str = None,
+                    metadata: Dict[str, Any] = None, request=None) -> Dict[str, Any]:
     audit_data = {
         'user': user,
         'action': action,
@@ -555,32 +897,87 @@ def log_user_action(user, action: str, target_type: str = None, target_id: str =
         audit_data['metadata']['ip_address'] = get_client_ip(request)
         audit_data['metadata']['user_agent'] = request.META.get('HTTP_USER_AGENT', '')
     
-    return AuditLog.objects.create(**audit_data)
+    return audit_data
+
+def log_user_action(user, action: str, target_type: str = None, target_id: str = None, 
+                   metadata: Dict[str, Any] = None, request=None):
+    """
+    Log user action në audit log
+    """
+    from .models_improved import AuditLog
+    
+    return AuditLog.objects.create(
+        **_audit_log_data(user, action, target_type, target_id, metadata, request)
+    )
+
+def log_user_action_bulk(entries: List[Dict[str, Any]]) -> list:
+    """
+    Log shumë veprime njëherësh (p.sh. bulk import/update)
+    
+    Args:
+        entries: listë me dict-e me të njëjtat argumente si log_user_action
+    
+    Returns:
+        Listë me AuditLog të krijuar
+    """
+    from .models_improved import AuditLog
+    
+    if not entries:
+        return []
+    
+    logs = [AuditLog(**_audit_log_data(**entry)) for entry in entries]
+    # Një transaksion dhe INSERT-e me batch në vend të një INSERT për rresht
+    with transaction.atomic():
+        return AuditLog.objects.bulk_create(logs, batch_size=AUDIT_LOG_BATCH_SIZE)
 
 # ==========================================
 # TEMPLATE UTILITIES
 # ==========================================
 
+def _replace_template_variable(variables: Dict[str, Any], match) -> str:
+    return str(variables.get(match.group(1), match.group(0)))
+
 def process_template_variables(template_content: str, variables: Dict[str, Any]) -> str:
     """
     Proces template variables në content
     """
-    import re
-    
-    def replace_variable(match):
-        var_name = match.group(1)
-        return str(variables.get(var_name, match.group(0)))
+    # Pa variabla ose pa placeholders nuk ka asgjë për të zëvendësuar
+    if not variables or '{{' not in template_content:
+        return template_content
     
     # Replace {{variable_name}} patterns
-    processed_content = re.sub(r'\{\{(\w+)\}\}', replace_variable, template_content)
+    return _TPL_VAR_RE.sub(partial(_replace_template_variable, variables), template_content)
+
+@lru_cache(maxsize=512)
+def compile_template(template_content: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Ndan template-in një herë në pjesë literale dhe emra variablash
     
-    return processed_content
+    Returns:
+        Tuple: (literals, names), ku len(literals) == len(names) + 1
+    """
+    parts = _TPL_VAR_RE.split(template_content)
+    return tuple(parts[0::2]), tuple(parts[1::2])
+
+def render_compiled(compiled: Tuple[Tuple[str, ...], Tuple[str, ...]],
+                    variables: Dict[str, Any]) -> str:
+    """
+    Render template të kompiluar me compile_template, pa regex në kohën e render-it
+    """
+    literals, names = compiled
+    chunks = [literals[0]]
+    for name, literal in zip(names, literals[1:]):
+        chunks.append(str(variables[name]) if name in variables else '{{%s}}' % name)
+        chunks.append(literal)
+    return ''.join(chunks)
+
+@lru_cache(maxsize=512)
+def _extract_template_variables(template_content: str) -> Tuple[str, ...]:
+    # Template-t janë statike, kështu që skanimi me regex ruhet sipas content-it
+    return tuple({match.group(1) for match in _TPL_VAR_RE.finditer(template_content)})
 
 def get_available_template_variables(template_content: str) -> List[str]:
     """
     Ekstrakton available template variables nga content
     """
-    import re
-    
-    variables = re.findall(r'\{\{(\w+)\}\}', template_content)
-    return list(set(variables))
+    return list(_extract_template_variables(template_content))
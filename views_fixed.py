@@ -3,7 +3,7 @@ from django.shortcuts import get_object_or_404
 from django.http import HttpResponse, JsonResponse, Http404
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.db.models import Q, Count, Prefetch
+from django.db.models import Q, Prefetch
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
@@ -182,7 +182,7 @@ class CaseViewSet(viewsets.ModelViewSet):
             return Response({'message': 'Document already linked to this case'})
 
 class DocumentCategoryViewSet(viewsets.ModelViewSet):
-    queryset = DocumentCategory.objects.annotate(types_count=Count('types'))
+    queryset = DocumentCategory.objects.all()
     serializer_class = DocumentCategorySerializer
     permission_classes = [IsLawyerOrReadOnly]
 
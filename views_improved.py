@@ -1,15 +1,18 @@
 # views_improved.py - Views të përmirësuara për strukturën e re
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, JsonResponse, Http404
+from django.http import FileResponse, JsonResponse, Http404
 from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Count, Prefetch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
+from functools import lru_cache, wraps
 import mimetypes
 import os
 
@@ -17,6 +20,9 @@ from .models_improved import (
     User, Client, Case, Document, DocumentCategory, DocumentType,
     DocumentStatus, DocumentCaseRelation, DocumentAccess, DocumentAuditLog
 )
+from . import audit
+from .perm_cache import ACCESS_PERMISSION_FIELDS, get_user_access_profile, invalidate_user_access_profile
+from .tasks import log_document_view
 from .serializers_improved import (
     UserSerializer, ClientSerializer, CaseSerializer, DocumentSerializer,
     DocumentCategorySerializer, DocumentTypeSerializer, DocumentStatusSerializer,
@@ -28,6 +34,37 @@ from .serializers_improved import (
 # CUSTOM PERMISSIONS
 # ==========================================
 
+@lru_cache(maxsize=None)
+def _serializer_field_names(serializer_class):
+    """Emrat e fushave të serializer-it (llogariten një herë për klasë)"""
+    return frozenset(serializer_class().fields)
+
+def _get_user_access(request):
+    """Profili i aksesit i user-it (nga cache), i lexuar një herë për request"""
+    profile = request.__dict__.get('_user_access')
+    if profile is None:
+        profile = request._user_access = get_user_access_profile(request.user)
+    return profile
+
+def _cache_per_request(check):
+    """
+    Ruan rezultatin e has_object_permission në request, që thirrjet e përsëritura
+    të DRF-së për të njëjtin objekt të mos e rivlerësojnë kontrollin
+    """
+    @wraps(check)
+    def wrapper(self, request, view, obj):
+        pk = getattr(obj, 'pk', None)
+        if pk is None:
+            return check(self, request, view, obj)
+        
+        cache = request.__dict__.setdefault('_perm_cache', {})
+        key = (type(self).__name__, type(view).__name__, pk, request.method)
+        if key not in cache:
+            cache[key] = check(self, request, view, obj)
+        return cache[key]
+    
+    return wrapper
+
 class IsLawyerOrReadOnly(permissions.BasePermission):
     """
     Custom permission për kontroll bazuar në role
@@ -37,6 +74,7 @@ class IsLawyerOrReadOnly(permissions.BasePermission):
             return True
         return hasattr(request.user, 'role') and request.user.role in ['lawyer', 'admin']
 
+    @_cache_per_request
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
@@ -49,6 +87,14 @@ class IsLawyerOrReadOnly(permissions.BasePermission):
         
         return request.user.role == 'admin'
 
+# Fusha e DocumentAccess që kontrollohet për çdo HTTP method
+_METHOD_PERMISSION_FIELDS = {
+    **{method: 'can_view' for method in permissions.SAFE_METHODS},
+    'PUT': 'can_edit',
+    'PATCH': 'can_edit',
+    'DELETE': 'can_delete',
+}
+
 class DocumentPermission(permissions.BasePermission):
     """
     Custom permission për dokumente bazuar në access level dhe access controls
@@ -56,6 +102,7 @@ class DocumentPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated
 
+    @_cache_per_request
     def has_object_permission(self, request, view, obj):
         user = request.user
         
@@ -64,7 +111,7 @@ class DocumentPermission(permissions.BasePermission):
             return True
         
         # Krijuesi ka akses të plotë
-        if obj.created_by == user:
+        if obj.created_by_id == user.id:
             return True
         
         # Kontrollo access level
@@ -75,29 +122,41 @@ class DocumentPermission(permissions.BasePermission):
             if obj.access_level == 'internal' and user.role in ['lawyer', 'paralegal']:
                 return True
         
-        # Kontrollo access controls specifike
-        access = obj.access_controls.filter(user=user).first()
+        # Kontrollo access controls specifike, pastaj ato bazuar në role
+        access = _get_user_access(request)['document_access'].get(obj.pk)
         if access:
-            if request.method in permissions.SAFE_METHODS:
-                return access.can_view
-            elif request.method in ['PUT', 'PATCH']:
-                return access.can_edit
-            elif request.method == 'DELETE':
-                return access.can_delete
-        
-        # Kontrollo access controls bazuar në role
-        role_access = obj.access_controls.filter(role=user.role).first()
-        if role_access:
-            if request.method in permissions.SAFE_METHODS:
-                return role_access.can_view
-            elif request.method in ['PUT', 'PATCH']:
-                return role_access.can_edit
-            elif request.method == 'DELETE':
-                return role_access.can_delete
+            permission_field = _METHOD_PERMISSION_FIELDS.get(request.method)
+            return bool(permission_field and access[permission_field])
         
         # Default: jo akses
         return False
 
+# ==========================================
+# SEARCH
+# ==========================================
+
+def _client_search_q(search):
+    return Q(full_name__icontains=search) | Q(email__icontains=search) | Q(organization__icontains=search)
+
+def _case_search_q(search):
+    return Q(title__icontains=search) | Q(uid__icontains=search) | Q(description__icontains=search)
+
+def _document_search_q(search):
+    return Q(title__icontains=search) | Q(description__icontains=search) | Q(tags__icontains=search)
+
+# ==========================================
+# CACHED LOOKUPS
+# ==========================================
+
+@lru_cache(maxsize=1)
+def _draft_status_id():
+    """ID e statusit 'Draft' për dokumentet e krijuara nga template"""
+    return DocumentStatus.objects.filter(name='Draft').values_list('id', flat=True).first()
+
+@receiver([post_save, post_delete], sender=DocumentStatus)
+def _clear_draft_status_id(sender, **kwargs):
+    _draft_status_id.cache_clear()
+
 # ==========================================
 # VIEWSETS
 # ==========================================
@@ -123,11 +182,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         # Filtro bazuar në search parameter
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(full_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(organization__icontains=search)
-            )
+            queryset = queryset.filter(_client_search_q(search))
         
         return queryset
 
@@ -137,30 +192,46 @@ class CaseViewSet(viewsets.ModelViewSet):
     permission_classes = [IsLawyerOrReadOnly]
     
     def get_queryset(self):
-        queryset = Case.objects.select_related('client', 'assigned_to').prefetch_related(
-            Prefetch('documentcaserelation_set__document')
-        )
+        queryset = Case.objects.select_related('client', 'assigned_to')
+        
+        # Ngarko vetëm të dhënat që serializer-i i përdor
+        fields = _serializer_field_names(self.get_serializer_class())
+        if 'documents' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'documentcaserelation_set',
+                queryset=DocumentCaseRelation.objects.select_related(
+                    'document__document_type', 'document__status'
+                )
+            ))
+        elif 'documents_count' in fields:
+            queryset = queryset.annotate(documents_count=Count('documentcaserelation', distinct=True))
+        
+        if 'events_count' in fields:
+            queryset = queryset.annotate(events_count=Count('events', distinct=True))
         
         # Filtro për klientët (mund të shohin vetëm rastet e tyre)
         if self.request.user.role == 'client':
             queryset = queryset.filter(client__user=self.request.user)
         
-        # Filtrime të tjera
-        status_filter = self.request.query_params.get('status', None)
+        # Filtrime të tjera (kapërcehen kur request-i nuk ka parametra)
+        params = self.request.query_params
+        if params:
+            queryset = self._apply_query_params(queryset, params)
+        
+        return queryset
+    
+    def _apply_query_params(self, queryset, params):
+        status_filter = params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        case_type_filter = self.request.query_params.get('case_type', None)
+        case_type_filter = params.get('case_type', None)
         if case_type_filter:
             queryset = queryset.filter(case_type=case_type_filter)
         
-        search = self.request.query_params.get('search', None)
+        search = params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(uid__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = queryset.filter(_case_search_q(search))
         
         return queryset
     
@@ -172,33 +243,35 @@ class CaseViewSet(viewsets.ModelViewSet):
         relationship_type = request.data.get('relationship_type', 'primary')
         
         try:
-            document = Document.objects.get(id=document_id)
+            document = Document.objects.only('id').get(id=document_id)
         except Document.DoesNotExist:
             return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Kontrollo nëse lidhja ekziston tashmë
-        relation, created = DocumentCaseRelation.objects.get_or_create(
-            document=document,
-            case=case,
-            relationship_type=relationship_type,
-            defaults={'added_by': request.user}
-        )
-        
-        if created:
-            # Log action
-            DocumentAuditLog.objects.create(
-                document=document,
-                user=request.user,
-                action='linked_to_case',
-                metadata={'case_id': case.id, 'case_title': case.title}
-            )
-            
-            return Response({'message': 'Document added to case successfully'})
-        else:
+        # INSERT direkt: unique_together (document, case, relationship_type) e refuzon
+        # lidhjen ekzistuese, pa SELECT paraprak si te get_or_create
+        try:
+            with transaction.atomic():
+                DocumentCaseRelation.objects.create(
+                    document=document,
+                    case=case,
+                    relationship_type=relationship_type,
+                    added_by=request.user
+                )
+                
+                # Log action
+                audit.enqueue(
+                    document_id=document.id,
+                    user_id=request.user.id,
+                    action='linked_to_case',
+                    metadata={'case_id': case.id, 'case_title': case.title}
+                )
+        except IntegrityError:
             return Response({'message': 'Document already linked to this case'})
+        
+        return Response({'message': 'Document added to case successfully'})
 
 class DocumentCategoryViewSet(viewsets.ModelViewSet):
-    queryset = DocumentCategory.objects.annotate(types_count=Count('types'))
+    queryset = DocumentCategory.objects.all()
     serializer_class = DocumentCategorySerializer
     permission_classes = [IsLawyerOrReadOnly]
 
@@ -225,6 +298,20 @@ class DocumentStatusViewSet(viewsets.ModelViewSet):
     serializer_class = DocumentStatusSerializer
     permission_classes = [IsLawyerOrReadOnly]
 
+# Të gjitha fushat e Document (DocumentSerializer i përdor) dhe vetëm fushat e
+# tabelave të lidhura që serializer-i lexon; p.sh. User nuk ngarkon password etj.
+_DOCUMENT_QUERY_FIELDS = tuple(field.name for field in Document._meta.concrete_fields) + (
+    'document_type__name',
+    'status__name', 'status__color',
+    'created_by__username',
+    'uploaded_by__username',
+)
+
+# Fushat që lejohen te ?fields= (vetëm kolonat e Document, pa lookups në tabela të tjera)
+_DOCUMENT_VALUES_FIELDS = frozenset(
+    name for field in Document._meta.concrete_fields for name in (field.name, field.attname)
+)
+
 class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
@@ -234,49 +321,64 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Document.objects.select_related(
             'document_type', 'status', 'created_by', 'uploaded_by'
-        ).prefetch_related(
-            'documentcaserelation_set__case',
-            'access_controls'
+        ).only(*_DOCUMENT_QUERY_FIELDS).prefetch_related(
+            # DocumentAccessSerializer lexon user.username dhe granted_by.username për çdo rresht
+            Prefetch('access_controls', queryset=DocumentAccess.objects.select_related('user', 'granted_by'))
         )
         
-        # Filtrime të ndryshme
-        document_type = self.request.query_params.get('document_type', None)
+        if 'related_cases' in _serializer_field_names(self.get_serializer_class()):
+            queryset = queryset.prefetch_related(Prefetch(
+                'documentcaserelation_set',
+                queryset=DocumentCaseRelation.objects.select_related('case', 'added_by')
+            ))
+        
+        # Filtrime të ndryshme (kapërcehen kur request-i nuk ka parametra)
+        params = self.request.query_params
+        if params:
+            queryset = self._apply_query_params(queryset, params)
+        
+        # Kontrollo access bazuar në user role
+        if self.request.user.role == 'client':
+            # Klientët shohin vetëm dokumentet e rasteve të tyre ose public documents
+            client_document_ids = DocumentCaseRelation.objects.filter(
+                case__client__user=self.request.user
+            ).values('document_id')
+            queryset = queryset.filter(
+                Q(id__in=client_document_ids) |
+                Q(access_level='public')
+            )
+        
+        return queryset
+    
+    def _apply_query_params(self, queryset, params):
+        document_type = params.get('document_type', None)
         if document_type:
             queryset = queryset.filter(document_type_id=document_type)
         
-        status_filter = self.request.query_params.get('status', None)
+        status_filter = params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status_id=status_filter)
         
-        is_template = self.request.query_params.get('is_template', None)
+        is_template = params.get('is_template', None)
         if is_template is not None:
             queryset = queryset.filter(is_template=is_template.lower() == 'true')
         
-        access_level = self.request.query_params.get('access_level', None)
+        access_level = params.get('access_level', None)
         if access_level:
             queryset = queryset.filter(access_level=access_level)
         
-        case_id = self.request.query_params.get('case', None)
+        case_id = params.get('case', None)
         if case_id:
-            queryset = queryset.filter(documentcaserelation__case_id=case_id)
-        
-        search = self.request.query_params.get('search', None)
-        if search:
+            # Semi-join me subquery: pa JOIN që dyfishon rreshtat, pa distinct()
             queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(tags__icontains=search)
+                id__in=DocumentCaseRelation.objects.filter(case_id=case_id).values('document_id')
             )
         
-        # Kontrollo access bazuar në user role
-        if self.request.user.role == 'client':
-            # Klientët shohin vetëm dokumentet e rasteve të tyre ose public documents
-            queryset = queryset.filter(
-                Q(documentcaserelation__case__client__user=self.request.user) |
-                Q(access_level='public')
-            )
+        search = params.get('search', None)
+        if search:
+            queryset = queryset.filter(_document_search_q(search))
         
-        return queryset.distinct()
+        return queryset
     
     def perform_create(self, serializer):
         # Set created_by and uploaded_by
@@ -287,9 +389,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         # Log creation
         document = serializer.instance
-        DocumentAuditLog.objects.create(
-            document=document,
-            user=self.request.user,
+        audit.enqueue(
+            document_id=document.id,
+            user_id=self.request.user.id,
             action='created',
             ip_address=self.get_client_ip(),
             user_agent=self.request.META.get('HTTP_USER_AGENT', '')
@@ -300,29 +402,50 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         # Log update
         document = serializer.instance
-        DocumentAuditLog.objects.create(
-            document=document,
-            user=self.request.user,
+        audit.enqueue(
+            document_id=document.id,
+            user_id=self.request.user.id,
             action='updated',
             ip_address=self.get_client_ip(),
             user_agent=self.request.META.get('HTTP_USER_AGENT', '')
         )
     
+    def list(self, request, *args, **kwargs):
+        """
+        Me ?fields=id,title,... kthen vetëm ato kolona si dict (values()),
+        pa krijuar model instances dhe pa kaluar nga DocumentSerializer
+        """
+        fields_param = request.query_params.get('fields')
+        if not fields_param:
+            return super().list(request, *args, **kwargs)
+        
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+        invalid_fields = [field for field in fields if field not in _DOCUMENT_VALUES_FIELDS]
+        if not fields or invalid_fields:
+            return Response(
+                {'error': f"Invalid fields: {', '.join(invalid_fields) or fields_param}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*fields)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(list(page))
+        return Response(list(queryset))
+    
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        # Update last_accessed
-        instance.last_accessed = timezone.now()
-        instance.save(update_fields=['last_accessed'])
-        
-        # Log view
-        DocumentAuditLog.objects.create(
-            document=instance,
-            user=request.user,
-            action='viewed',
-            ip_address=self.get_client_ip(),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        # Update last_accessed dhe log view në Celery, jashtë kohës së përgjigjes
+        view_log_args = (
+            instance.id,
+            request.user.id,
+            self.get_client_ip(),
+            request.META.get('HTTP_USER_AGENT', '')
         )
+        # robust=True: një broker i paarritshëm logohet, por nuk e prish leximin e dokumentit
+        transaction.on_commit(lambda: log_document_view.delay(*view_log_args), robust=True)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -337,9 +460,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         # Log download
-        DocumentAuditLog.objects.create(
-            document=document,
-            user=request.user,
+        audit.enqueue(
+            document_id=document.id,
+            user_id=request.user.id,
             action='downloaded',
             ip_address=self.get_client_ip(),
             user_agent=request.META.get('HTTP_USER_AGENT', '')
@@ -347,12 +470,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         # Return file
         if document.file:
-            response = HttpResponse(
-                document.file.read(),
-                content_type=mimetypes.guess_type(document.file.path)[0] or 'application/octet-stream'
+            # Stream-on file-in me pjesë, pa e lexuar të gjithë në memorie
+            return FileResponse(
+                document.file.open('rb'),
+                as_attachment=True,
+                filename=os.path.basename(document.file.name),
+                content_type=mimetypes.guess_type(document.file.name)[0] or 'application/octet-stream'
             )
-            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(document.file.name)}"'
-            return response
         else:
             return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -368,11 +492,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
             # Merr dokumentet
             documents = Document.objects.filter(id__in=document_ids)
             
-            # Kontrollo permissions për çdo dokument
-            allowed_documents = []
-            for doc in documents:
-                if self.check_object_permissions(request, doc):
-                    allowed_documents.append(doc)
+            # Kontrollo permissions për çdo dokument në Python: profili i aksesit
+            # lexohet një herë, jo dy query për dokument
+            permission = DocumentPermission()
+            allowed_documents = [
+                doc for doc in documents
+                if permission.has_object_permission(request, self, doc)
+            ]
             
             if not allowed_documents:
                 return Response({'error': 'No documents accessible'}, status=status.HTTP_403_FORBIDDEN)
@@ -403,7 +529,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 title=title,
                 description=f"Created from template: {template.title}",
                 document_type=template.document_type,
-                status=DocumentStatus.objects.filter(name='Draft').first() or template.status,
+                status_id=_draft_status_id() or template.status_id,
                 is_template=False,
                 template_variables=template_vars,
                 metadata={'created_from_template': template.id},
@@ -423,9 +549,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 )
             
             # Log creation
-            DocumentAuditLog.objects.create(
-                document=new_document,
-                user=request.user,
+            audit.enqueue(
+                document_id=new_document.id,
+                user_id=request.user.id,
                 action='created',
                 metadata={'template_id': template.id}
             )
@@ -448,49 +574,62 @@ class DocumentViewSet(viewsets.ModelViewSet):
         role = request.data.get('role')
         permissions_data = request.data.get('permissions', {})
         
+        access_defaults = {
+            'can_view': permissions_data.get('can_view', True),
+            'can_download': permissions_data.get('can_download', True),
+            'can_edit': permissions_data.get('can_edit', False),
+            'can_delete': permissions_data.get('can_delete', False),
+            'can_share': permissions_data.get('can_share', False),
+            'granted_by': request.user
+        }
+        
         if user_id:
-            user = get_object_or_404(User, id=user_id)
-            access, created = DocumentAccess.objects.update_or_create(
-                document=document,
-                user=user,
-                defaults={
-                    'can_view': permissions_data.get('can_view', True),
-                    'can_download': permissions_data.get('can_download', True),
-                    'can_edit': permissions_data.get('can_edit', False),
-                    'can_delete': permissions_data.get('can_delete', False),
-                    'can_share': permissions_data.get('can_share', False),
-                    'granted_by': request.user
-                }
-            )
+            user = get_object_or_404(User.objects.only('id', 'username'), id=user_id)
             
-            action = 'access_granted' if created else 'access_updated'
-            DocumentAuditLog.objects.create(
-                document=document,
-                user=request.user,
-                action=action,
-                metadata={'target_user': user.username, 'permissions': permissions_data}
-            )
+            with transaction.atomic():
+                # Gjendja e mëparshme për audit trail: dallon grant-in e ri nga ndryshimi
+                previous = DocumentAccess.objects.filter(
+                    document=document, user=user
+                ).values(*ACCESS_PERMISSION_FIELDS).first()
+                
+                # Një INSERT ... ON CONFLICT (document, user) DO UPDATE në vend të
+                # SELECT FOR UPDATE + UPDATE/INSERT të update_or_create
+                DocumentAccess.objects.bulk_create(
+                    [DocumentAccess(document=document, user=user, **access_defaults)],
+                    update_conflicts=True,
+                    unique_fields=['document', 'user'],
+                    update_fields=list(access_defaults),
+                )
+                # bulk_create nuk dërgon post_save, prandaj profili i cache-uar hiqet këtu
+                invalidate_user_access_profile(user.id)
+                
+                action = 'access_granted' if previous is None else 'access_updated'
+                audit.enqueue(
+                    document_id=document.id,
+                    user_id=request.user.id,
+                    action=action,
+                    metadata={
+                        'target_user': user.username,
+                        'permissions': permissions_data,
+                        'previous_permissions': previous,
+                        'new_permissions': {field: access_defaults[field] for field in ACCESS_PERMISSION_FIELDS},
+                    }
+                )
             
             return Response({'message': f'Access {action} successfully'})
         
         elif role:
+            # (document, role) nuk ka unique constraint, prandaj mbetet update_or_create
             access, created = DocumentAccess.objects.update_or_create(
                 document=document,
                 role=role,
-                defaults={
-                    'can_view': permissions_data.get('can_view', True),
-                    'can_download': permissions_data.get('can_download', True),
-                    'can_edit': permissions_data.get('can_edit', False),
-                    'can_delete': permissions_data.get('can_delete', False),
-                    'can_share': permissions_data.get('can_share', False),
-                    'granted_by': request.user
-                }
+                defaults=access_defaults
             )
             
             action = 'role_access_granted' if created else 'role_access_updated'
-            DocumentAuditLog.objects.create(
-                document=document,
-                user=request.user,
+            audit.enqueue(
+                document_id=document.id,
+                user_id=request.user.id,
                 action=action,
                 metadata={'target_role': role, 'permissions': permissions_data}
             )
@@ -516,7 +655,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if user.role == 'admin':
             return True
         
-        if document.created_by == user:
+        if document.created_by_id == user.id:
             return True
         
         if document.access_level == 'public':
@@ -526,63 +665,53 @@ class DocumentViewSet(viewsets.ModelViewSet):
             return True
         
         # Kontrollo access controls
-        access = document.access_controls.filter(user=user).first()
+        access = _get_user_access(self.request)['document_access'].get(document.pk)
         if access:
-            return access.can_download
-        
-        role_access = document.access_controls.filter(role=user.role).first()
-        if role_access:
-            return role_access.can_download
+            return access['can_download']
         
         return False
     
     def execute_bulk_action(self, action_type, documents, data, user):
-        """Ekzekuton bulk actions"""
+        """Ekzekuton bulk actions me një UPDATE/DELETE dhe një bulk_create për audit log"""
         results = {'success': 0, 'failed': 0, 'errors': []}
+        document_ids = [document.id for document in documents]
+        affected = Document.objects.filter(id__in=document_ids)
+        
+        def audit_logs(action, metadata=None):
+            return [
+                DocumentAuditLog(document=document, user=user, action=action, metadata=metadata)
+                for document in documents
+            ]
         
-        with transaction.atomic():
-            for document in documents:
-                try:
-                    if action_type == 'delete':
-                        DocumentAuditLog.objects.create(
-                            document=document,
-                            user=user,
-                            action='deleted'
+        try:
+            with transaction.atomic():
+                if action_type == 'delete':
+                    DocumentAuditLog.objects.bulk_create(audit_logs('deleted'))
+                    affected.delete()
+                    results['success'] = len(documents)
+                
+                elif action_type == 'change_status':
+                    new_status_id = data.get('new_status')
+                    if new_status_id:
+                        status_obj = DocumentStatus.objects.get(id=new_status_id)
+                        # update() nuk kalon nga save(), prandaj updated_at vendoset këtu
+                        affected.update(status=status_obj, updated_at=timezone.now())
+                        DocumentAuditLog.objects.bulk_create(
+                            audit_logs('status_changed', {'new_status': status_obj.name})
                         )
-                        document.delete()
-                        results['success'] += 1
-                    
-                    elif action_type == 'change_status':
-                        new_status_id = data.get('new_status')
-                        if new_status_id:
-                            status_obj = DocumentStatus.objects.get(id=new_status_id)
-                            document.status = status_obj
-                            document.save()
-                            
-                            DocumentAuditLog.objects.create(
-                                document=document,
-                                user=user,
-                                action='status_changed',
-                                metadata={'new_status': status_obj.name}
-                            )
-                            results['success'] += 1
-                    
-                    elif action_type == 'change_access_level':
-                        new_level = data.get('access_level')
-                        if new_level:
-                            document.access_level = new_level
-                            document.save()
-                            
-                            DocumentAuditLog.objects.create(
-                                document=document,
-                                user=user,
-                                action='access_level_changed',
-                                metadata={'new_access_level': new_level}
-                            )
-                            results['success'] += 1
-                    
-                except Exception as e:
-                    results['failed'] += 1
-                    results['errors'].append(f"Document {document.id}: {str(e)}")
+                        results['success'] = len(documents)
+                
+                elif action_type == 'change_access_level':
+                    new_level = data.get('access_level')
+                    if new_level:
+                        affected.update(access_level=new_level, updated_at=timezone.now())
+                        DocumentAuditLog.objects.bulk_create(
+                            audit_logs('access_level_changed', {'new_access_level': new_level})
+                        )
+                        results['success'] = len(documents)
+        
+        except Exception as e:
+            results['failed'] = len(documents)
+            results['errors'].append(f"Documents {document_ids}: {str(e)}")
         
         return results